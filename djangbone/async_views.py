@@ -0,0 +1,313 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
+from django.db import transaction
+from django.http import Http404, HttpResponse
+
+from djangbone.views import BackboneAPIView, InvalidRequest, ModelAPIView, StreamedCollection
+
+
+async def aiterate(items):
+    """
+    Iterate asynchronously over an async or regular iterable (or a
+    StreamedCollection of either).
+    """
+    if isinstance(items, StreamedCollection):
+        items = items.items
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class AsyncBackboneAPIView(BackboneAPIView):
+    """
+    Async counterpart of BackboneAPIView, for ASGI deployments. Requests are
+    handled on the event loop instead of tying up a thread each, which matters
+    most when many slow clients are connected (eg. to streamed collections).
+
+    The hooks (read(), read_single_item(), read_collection(), create(),
+    update(), delete(), the bulk_*() hooks, get_validators() and user_may_read()) take the same
+    arguments and return the same values as BackboneAPIView's, but must be
+    coroutines (ie. defined with async def).
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = self.start_request(request, args, kwargs)
+        with self.metrics.collect():
+            try:
+                response = await handler(request, *args, **kwargs)
+            except InvalidRequest as e:
+                response = self.error_response(str(e), status=e.status)
+        return self.finish_request(response)
+
+    async def request_too_large(self, request, *args, **kwargs):
+        return super(AsyncBackboneAPIView, self).request_too_large(request, *args, **kwargs)
+
+    async def create(self, data={}, files={}):
+        return False, { 'status': 501 }
+
+    async def read(self, id=None):
+        if id:
+            return await self.read_single_item(id)
+        else:
+            return await self.read_collection()
+
+    async def read_single_item(self, id):
+        return None
+
+    async def read_collection(self):
+        return None
+
+    async def update(self, id, data={}, files={}):
+        return False, { 'status': 501 }
+
+    async def delete(self, id):
+        return False
+
+    async def bulk_create(self, items):
+        return False, { 'status': 501 }
+
+    async def bulk_update(self, items):
+        return False, { 'status': 501 }
+
+    async def bulk_delete(self, ids):
+        return False, { 'status': 501 }
+
+    async def get_validators(self, id=None):
+        return None, None
+
+    async def user_may_read(self, id=None):
+        return True
+
+    async def encode_stream(self, items):
+        """
+        Async version of BackboneAPIView.encode_stream(), which accepts an async
+        iterable of items and returns an async iterator for StreamingHttpResponse.
+        """
+        backend = self.get_response_backend()
+        chunk, separator = [b'['], b''
+        async for item in aiterate(items):
+            chunk.append(separator + backend.encode(item))
+            separator = b','
+            if len(chunk) >= self.stream_chunk_size:
+                yield b''.join(chunk)
+                chunk = []
+        chunk.append(b']')
+        yield b''.join(chunk)
+
+    async def _get(self, request, *args, **kwargs):
+        id = kwargs.get('id', None)
+        etag = last_modified = None
+        if self.conditional_get:
+            etag, last_modified = await self.get_validators(id)
+            response = self.not_modified_response(request, etag, last_modified)
+            if response is not None:
+                return response if await self.user_may_read(id) else self.error_response(status=404)
+        with self.metrics.phase('read'):
+            data = await self.read(id)
+        if isinstance(data, StreamedCollection) and not self.get_response_backend().streamable:
+            data = [item async for item in aiterate(data)]
+        return self.read_response(request, data, etag, last_modified)
+
+    async def _post(self, request, *args, **kwargs):
+        try:
+            data, files = self.get_request_data(request)
+        except ValueError:
+            return self.error_response(status=400)
+        bulk = isinstance(data, list)
+        with self.metrics.phase('create'):
+            if bulk:
+                success, data = await self.bulk_create(data)
+            else:
+                success, data = await self.create(data, files)
+
+        if success:
+            return self.success_response(data) if bulk else self.write_success_response(data)
+        else:
+            return self.error_response(data.get('errors', {}), data.get('status', 400))
+
+    async def _put(self, request, *args, **kwargs):
+        try:
+            data, files = self.get_request_data(request)
+        except ValueError:
+            return HttpResponse('Invalid POST DATA', status=400)
+        if 'id' not in kwargs and not isinstance(data, list):
+            raise Http404
+        with self.metrics.phase('update'):
+            if 'id' in kwargs:
+                success, data = await self.update(kwargs['id'], data, files)
+            else:
+                success, data = await self.bulk_update(data)
+
+        if success:
+            return self.write_success_response(data) if 'id' in kwargs else self.success_response(data)
+        else:
+            return self.error_response(data.get('errors', {}), data.get('status', 400))
+
+    async def _delete(self, request, *args, **kwargs):
+        if 'id' not in kwargs:
+            # Collections can only be deleted from in bulk, by sending a list of ids:
+            try:
+                data = self.get_request_data(request)[0] if request.body else None
+            except ValueError:
+                return self.error_response(status=400)
+            if not isinstance(data, list):
+                return HttpResponse('DELETE is not supported for collections', status=405)
+            with self.metrics.phase('delete'):
+                success, data = await self.bulk_delete(data)
+            if success:
+                return self.success_response(data)
+            else:
+                return self.error_response(data.get('errors', {}), data.get('status', 400))
+        with self.metrics.phase('delete'):
+            success = await self.delete(kwargs['id'])
+        if success:
+            return self.success_response()
+        else:
+            return self.error_response(status=404)
+
+
+class AsyncModelAPIView(AsyncBackboneAPIView, ModelAPIView):
+    """
+    Async counterpart of ModelAPIView. Single item and collection GETs, and
+    the instances that PUTs and DELETEs change, are read with Django's async
+    ORM, and streamed collections are read with aiterator(). Forms have no
+    async API, and writes need a transaction (which is tied to a thread), so
+    saving and deleting run through sync_to_async(), as do the less common paths
+    (cursor pagination, delta syncs, bulk requests, caching, validators, and
+    writes with lock_for_update), which reuse ModelAPIView's implementations.
+
+    user_has_perm(), filter_queryset_for_user() and the other helpers that
+    only build querysets are called directly, so they shouldn't query the
+    database themselves. With read_your_writes, the session is loaded in a
+    thread before the request is handled, so that database-backed sessions
+    can be read and written from the event loop.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        session = getattr(request, 'session', None)
+        if self.read_your_writes and session is not None:
+            await sync_to_async(session.keys)()
+        return await super(AsyncModelAPIView, self).dispatch(request, *args, **kwargs)
+
+    async def aget_object(self, id, action=None):
+        """
+        Async version of ModelAPIView.get_object().
+        """
+        try:
+            return await self.get_queryset(action).aget(pk=id)
+        except (ObjectDoesNotExist, MultipleObjectsReturned, ValueError):
+            return None
+
+    async def aserialize_qs(self, queryset, single_object=False):
+        """
+        Async version of ModelAPIView.serialize_qs(). Streamed collections are
+        returned as a StreamedCollection of an async iterator. A serialize_qs()
+        overridden by a subclass is called instead, through sync_to_async().
+        """
+        single_object = single_object or self.kwargs.get('id')
+        if (self.uses_cursor_pagination() and not single_object) or self.get_metadata().custom_serialize_qs:
+            return await sync_to_async(self.serialize_qs)(queryset, single_object)
+        values = queryset.values(*self.serialize_fields) if self.serialize_fields else queryset.values()
+        if single_object:
+            rows = [row async for row in values[:1]]
+            return rows[0] if rows else {}
+        if self.total_count:
+            await sync_to_async(self.add_total_count)(values)
+        values = self.paginate_qs(values)
+        if self.stream_collections:
+            return StreamedCollection(values.aiterator(chunk_size=self.stream_chunk_size))
+        return [row async for row in values]
+
+    async def aserialize_instance(self, instance):
+        """
+        Async version of ModelAPIView.serialize_instance().
+        """
+        metadata = self.get_metadata()
+        if metadata.lookup_fields or metadata.custom_serialize_qs:
+            return await self.aserialize_qs(self.base_queryset.filter(pk=instance.pk), single_object=True)
+        return self.serialize_instance(instance)
+
+    async def _get(self, request, *args, **kwargs):
+        if not self.cache_alias:
+            return await super(AsyncModelAPIView, self)._get(request, *args, **kwargs)
+        key = await sync_to_async(self.get_cache_key)(kwargs.get('id', None))
+        response = await sync_to_async(self.get_cached_response)(request, key)
+        if response is None:
+            response = await super(AsyncModelAPIView, self)._get(request, *args, **kwargs)
+            await sync_to_async(self.cache_response)(key, response)
+        return response
+
+    async def get_validators(self, id=None):
+        return await sync_to_async(ModelAPIView.get_validators)(self, id)
+
+    async def user_may_read(self, id=None):
+        return await sync_to_async(ModelAPIView.user_may_read)(self, id)
+
+    async def read(self, id=None):
+        if self.sparse_fields:
+            self.serialize_fields = self.get_sparse_fields()
+        return await super(AsyncModelAPIView, self).read(id)
+
+    async def read_single_item(self, id):
+        instance = await self.aget_object(id, 'read_single_item')
+        if instance is None or not self.user_has_perm(self.request, instance, 'read_single_item'):
+            return None
+        with self.metrics.phase('serialize'):
+            return await self.aserialize_instance(instance)
+
+    async def read_collection(self):
+        metadata = self.get_metadata()
+        if metadata.checks_object_perms or metadata.checks_collection_perms:
+            # The default implementation reads the first object to check it:
+            if not await sync_to_async(self.user_has_collection_perm)(self.request, 'read_collection'):
+                return None
+        qs = self.filter_collection_qs(self.get_queryset('read_collection'))
+        if self.delta_sync and self.modified_field:
+            since = self.request.GET.get(self.since_param_name)
+            if since is not None:
+                return await sync_to_async(self.read_changes)(qs, since)
+            self.response_headers['X-Sync-Token'] = self.get_sync_token()
+        with self.metrics.phase('serialize'):
+            return await self.aserialize_qs(qs)
+
+    def write_atomic(self, func, *args):
+        """
+        Call func with args in a transaction on get_write_db(). Called through
+        sync_to_async(), so that the whole write runs on one thread.
+        """
+        with transaction.atomic(using=self.get_write_db(), savepoint=False):
+            return func(*args)
+
+    async def create(self, data={}, files={}):
+        return await sync_to_async(ModelAPIView.create)(self, data, files)
+
+    async def update(self, id, data={}, files={}):
+        if self.edit_form_class == None and self.validate_fields is None:
+            return False, { 'status': 501 }
+        if self.lock_for_update:
+            # The row lock has to be held in a transaction, which needs a single thread:
+            return await sync_to_async(ModelAPIView.update)(self, id, data, files)
+        instance = await self.aget_object(id, 'update')
+        if instance is None or not self.user_has_perm(self.request, instance, 'update'):
+            return False, { 'status': 404 }
+        return await sync_to_async(self.write_atomic)(self.update_instance, instance, data, files)
+
+    async def delete(self, id):
+        if self.lock_for_update:
+            return await sync_to_async(ModelAPIView.delete)(self, id)
+        instance = await self.aget_object(id, 'delete')
+        if instance is None or not self.user_has_perm(self.request, instance, 'delete'):
+            return False
+        return await sync_to_async(self.write_atomic)(self.delete_instance, instance)
+
+    async def bulk_create(self, items):
+        return await sync_to_async(ModelAPIView.bulk_create)(self, items)
+
+    async def bulk_update(self, items):
+        return await sync_to_async(ModelAPIView.bulk_update)(self, items)
+
+    async def bulk_delete(self, ids):
+        return await sync_to_async(ModelAPIView.bulk_delete)(self, ids)
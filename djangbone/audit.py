@@ -0,0 +1,83 @@
+import logging
+import logging.handlers
+import queue
+
+from djangbone.encoders import import_optional
+
+
+AUDIT_LOGGER_NAME = 'pivot.api'
+
+
+def format_value(value):
+    """
+    Format a value for an audit message. Dicts (request data, files and form
+    errors) go through the host project's utils.logging.logging_dict() when
+    it's available, which is only imported the first time a record is emitted.
+    """
+    if isinstance(value, dict):
+        utils_logging = import_optional('utils.logging')
+        if utils_logging is not None:
+            return utils_logging.logging_dict(value)
+    return '%s' % (value,)
+
+
+class AuditRecord(object):
+    """
+    A structured description of a write, eg. a successful CREATE on a model.
+
+    Log it as the argument of a '%s' message: the text (which can be expensive
+    to build) is only produced if a handler actually emits the record. Handlers
+    can also read the fields directly from the log record's 'audit' attribute.
+    """
+    def __init__(self, model_name, action, outcome, username, details=()):
+        self.model_name = model_name
+        self.action = action            # eg. 'CREATE', 'BULK_UPDATE'
+        self.outcome = outcome          # 'SUCCESS' or 'ERROR'
+        self.username = username
+        self.details = list(details)    # (name, value) pairs, in display order
+
+    def __str__(self):
+        details = ', '.join('%s=%s' % (name, format_value(value)) for name, value in self.details)
+        return '%s:%s:%s:%s: %s' % (self.model_name, self.action, self.outcome, self.username, details)
+
+
+class AuditQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that passes records to the queue unformatted, so that
+    formatting AuditRecords (as well as the I/O) happens on the listener's
+    thread rather than the request's. The standard QueueHandler formats each
+    message before queueing it. Records are dropped if the queue is full.
+    """
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def start_audit_queue(logger_name=AUDIT_LOGGER_NAME, maxsize=10000):
+    """
+    Move the handlers that the audit logger uses (its own, and those of the
+    ancestors it propagates to) to a background thread, and return the running
+    QueueListener. Call its stop() method to flush the queue at shutdown.
+
+    Call this once your logging is configured, eg. from an AppConfig.ready().
+    When the queue is full, new records are dropped rather than blocking
+    requests.
+    """
+    audit_logger = logging.getLogger(logger_name)
+    handlers, current = [], audit_logger
+    while current is not None:
+        handlers.extend(current.handlers)
+        current = current.parent if current.propagate else None
+    for handler in list(audit_logger.handlers):
+        audit_logger.removeHandler(handler)
+    records = queue.Queue(maxsize)
+    audit_logger.addHandler(AuditQueueHandler(records))
+    audit_logger.propagate = False
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,167 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.db import connection, connections
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.utils.datastructures import MultiValueDict
+from django.utils.http import urlencode
+from django.views.generic import View
+
+from djangbone.encoders import DjangboneJSONEncoder
+
+
+async def await_response(response):
+    return await response
+
+
+class BatchView(View):
+    """
+    Handle several Backbone syncs in one round trip. The request body is a JSON
+    array of sub-requests, eg.
+
+        [{"method": "GET", "view": "widgets"},
+         {"method": "GET", "view": "widgets", "id": 3, "query": {"fields": "id,name"}},
+         {"method": "PUT", "view": "widgets", "id": 3, "body": {"name": "New name"}}]
+
+    Each one is dispatched straight to the view registered under its name in
+    the views dict, with a copy of the batch request (so the same user and
+    session, but without going through the url resolver or middleware again).
+    Views can be classes or view functions, so decorated views like
+    login_required(WidgetView.as_view()) keep their decorators' checks. The response is a JSON array with a { "status": ..., "headers":
+    {...}, "body": ... } object for each sub-request, in the same order.
+
+    Sub-requests run in order, but consecutive GETs can run concurrently in
+    max_workers threads, each with its own database connections.
+    """
+    views = {}              # { name: view class or view function } of views that sub-requests can use
+    max_requests = 50       # Maximum number of sub-requests in a batch
+    max_workers = 4         # Threads for running consecutive GETs concurrently (1 to disable)
+    hidden_headers = ('content-type', 'content-length', 'vary')   # Sub-response headers that aren't returned
+
+    json_encoder = DjangboneJSONEncoder()
+
+    def post(self, request, *args, **kwargs):
+        try:
+            batch = json.loads(request.body.decode('utf-8'))
+        except ValueError:
+            return self.error_response('Invalid JSON')
+        if not isinstance(batch, list) or not all(isinstance(item, dict) for item in batch):
+            return self.error_response('Expected a list of sub-requests')
+        if len(batch) > self.max_requests:
+            return self.error_response('Too many sub-requests (the maximum is %s)' % self.max_requests)
+
+        results, reads = [None] * len(batch), []
+        for index, item in enumerate(batch):
+            if str(item.get('method', 'GET')).upper() == 'GET':
+                reads.append(index)
+                continue
+            self.run_reads(request, batch, reads, results)
+            reads = []
+            results[index] = self.run(request, item)
+        self.run_reads(request, batch, reads, results)
+
+        body = b'[' + b','.join(results) + b']'
+        return HttpResponse(body, content_type='application/json')
+
+    def run_reads(self, request, batch, indexes, results):
+        """
+        Run the GET sub-requests with the given indexes, concurrently if there's
+        more than one and the database isn't in a transaction (whose changes
+        other threads' connections wouldn't see).
+        """
+        workers = min(self.max_workers, len(indexes))
+        if workers <= 1 or connection.in_atomic_block:
+            for index in indexes:
+                results[index] = self.run(request, batch[index])
+            return
+        self.load_request_state(request)
+        groups = [indexes[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for group, outputs in zip(groups, executor.map(lambda group: self.run_group(request, batch, group), groups)):
+                for index, output in zip(group, outputs):
+                    results[index] = output
+
+    def load_request_state(self, request):
+        """
+        Load the request's lazy user and session, which the sub-requests share,
+        before they are used from several threads at once.
+        """
+        if hasattr(request, 'user'):
+            request.user.pk
+        if hasattr(request, 'session'):
+            request.session.keys()
+
+    def run_group(self, request, batch, indexes):
+        """
+        Run some sub-requests in a worker thread, closing the thread's database
+        connections afterwards.
+        """
+        try:
+            return [self.run(request, batch[index]) for index in indexes]
+        finally:
+            connections.close_all()
+
+    def run(self, request, item):
+        """
+        Dispatch a sub-request to its view, and return its encoded result.
+        """
+        view = self.views.get(item.get('view'))
+        if view is None:
+            return self.encode_result(404, {}, self.json_encoder.encode({ 'error': 'Unknown view' }).encode('utf-8'))
+        method = str(item.get('method', 'GET')).upper()
+        sub_request = self.build_request(request, method, item.get('query') or {}, item.get('body'))
+        view_kwargs = {} if item.get('id') is None else { 'id': str(item['id']) }
+        if isinstance(view, type):
+            view = view.as_view()
+        response = view(sub_request, **view_kwargs)
+        if not isinstance(response, HttpResponse) and hasattr(response, '__await__'):
+            response = async_to_sync(await_response)(response)     # Async views
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        headers = dict((header, value) for header, value in response.items()
+                if header.lower() not in self.hidden_headers)
+        if not response.get('Content-Type', '').startswith('application/json'):
+            content = self.json_encoder.encode(content.decode('utf-8')).encode('utf-8') if content else b''
+        return self.encode_result(response.status_code, headers, content)
+
+    def encode_result(self, status, headers, content):
+        """
+        Encode a sub-response, inserting its JSON body as it is rather than
+        decoding and re-encoding it.
+        """
+        envelope = self.json_encoder.encode({ 'status': status, 'headers': headers }).encode('utf-8')
+        return envelope[:-1] + b',"body":' + (content or b'null') + b'}'
+
+    def build_request(self, request, method, query, body):
+        """
+        Build a sub-request from the batch request, with the given method, GET
+        parameters and JSON body.
+        """
+        sub_request = HttpRequest()
+        sub_request.method = method
+        sub_request.path = request.path
+        sub_request.path_info = request.path_info
+        sub_request.META = request.META.copy()
+        sub_request.META.update({
+            'REQUEST_METHOD': method,
+            'QUERY_STRING': urlencode(query, doseq=True),
+            'CONTENT_TYPE': 'application/json',
+            'HTTP_ACCEPT': 'application/json',
+        })
+        # Sub-responses are spliced into the batch response, so mustn't be compressed themselves:
+        sub_request.META.pop('HTTP_ACCEPT_ENCODING', None)
+        sub_request.GET = QueryDict(sub_request.META['QUERY_STRING'])
+        sub_request._body = self.json_encoder.encode(body).encode('utf-8') if body is not None else b''
+        sub_request.META['CONTENT_LENGTH'] = str(len(sub_request._body))
+        sub_request._post, sub_request._files = QueryDict(), MultiValueDict()
+        sub_request.COOKIES = request.COOKIES
+        for attribute in ('user', 'session'):
+            if hasattr(request, attribute):
+                setattr(sub_request, attribute, getattr(request, attribute))
+        return sub_request
+
+    def error_response(self, error, status=400):
+        return HttpResponse(self.json_encoder.encode({ 'error': error }), status=status, content_type='application/json')
@@ -0,0 +1,13 @@
+"""
+Benchmarks for djangbone. Run the request benchmark suite (see suite.py) with
+
+    python -m djangbone.benchmarks
+
+the audit logging micro-benchmark with
+
+    python -m djangbone.benchmarks.audit
+
+and the import and first request (start-up) benchmark with
+
+    python -m djangbone.benchmarks.startup
+"""
@@ -0,0 +1,47 @@
+"""
+Run the benchmark suite against a seeded SQLite database:
+
+    python -m djangbone.benchmarks --rows 10000 --save baseline.json
+    python -m djangbone.benchmarks --rows 10000 --compare baseline.json
+
+When comparing, the exit status is 1 if any scenario regressed.
+"""
+import argparse
+import json
+import sys
+
+from djangbone.benchmarks import suite
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m djangbone.benchmarks', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--rows', type=int, default=1000, help='number of rows to seed (default 1000)')
+    parser.add_argument('--page-size', type=int, default=50, help='page size for paginated views (default 50)')
+    parser.add_argument('--repeat', type=int, default=50, help='timed requests per scenario (default 50)')
+    parser.add_argument('--database', default=':memory:', help='SQLite database file (default in-memory)')
+    parser.add_argument('--save', metavar='FILE', help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with a saved baseline')
+    parser.add_argument('--threshold', type=float, default=1.2,
+            help='ratio above the baseline that counts as a regression (default 1.2)')
+    args = parser.parse_args(argv)
+
+    suite.configure(args.database)
+    results = suite.run(rows=args.rows, page_size=args.page_size, repeat=args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print(suite.format_results(results, baseline))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({ 'rows': args.rows, 'page_size': args.page_size, 'results': results }, f, indent=2, sort_keys=True)
+    if baseline is not None:
+        regressions = suite.compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print('REGRESSION: %s' % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Measure the per-write overhead of ModelAPIView's audit logging, comparing
+the old eagerly formatted messages with lazy AuditRecords, when the audit
+logger is disabled, logging synchronously, and logging through the queue
+set up by start_audit_queue(). Records go to a file with a timestamped
+format, either just written ('file') or also synced to disk ('synced', which
+stands in for slower handlers such as sockets or syslog). Django isn't needed
+to run this:
+
+    python -m djangbone.benchmarks.audit [iterations]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from djangbone.audit import AUDIT_LOGGER_NAME, AuditRecord, format_value, start_audit_queue
+
+
+logger = logging.getLogger(AUDIT_LOGGER_NAME)
+
+DATA = dict(('field_%s' % i, 'value %s' % i) for i in range(20))
+FILES = {}
+
+
+def eager_write():
+    # How ModelAPIView.create() used to log: the message is always built.
+    logger.info("%s:CREATE:SUCCESS:%s: id=%s, data=%s, files=%s"%\
+            ('Widget', 'someone', 1, format_value(DATA), format_value(FILES)))
+
+def lazy_write():
+    # What ModelAPIView.audit() does.
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    record = AuditRecord('Widget', 'CREATE', 'SUCCESS', 'someone', [('id', 1), ('data', DATA), ('files', FILES)])
+    logger.log(logging.INFO, '%s', record, extra={ 'audit': record })
+
+
+def time_per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+class SyncedFileHandler(logging.FileHandler):
+    """
+    FileHandler that syncs each record to disk.
+    """
+    def emit(self, record):
+        super(SyncedFileHandler, self).emit(record)
+        os.fsync(self.stream.fileno())
+
+
+def configure(level, handler_class, path):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = handler_class(path)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(process)d: %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def run(iterations=5000):
+    results = []
+    fd, path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+    try:
+        for handler_name, handler_class in (('file', logging.FileHandler), ('synced', SyncedFileHandler)):
+            for scenario, level in (('disabled', logging.WARNING), ('sync', logging.INFO), ('queued', logging.INFO)):
+                for name, func in (('eager', eager_write), ('lazy', lazy_write)):
+                    configure(level, handler_class, path)
+                    # A queue big enough that no records are dropped while timing:
+                    listener = start_audit_queue(maxsize=iterations) if scenario == 'queued' else None
+                    per_call = time_per_call(func, iterations)
+                    if listener is not None:
+                        listener.stop()
+                    results.append((handler_name, scenario, name, per_call))
+    finally:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        os.remove(path)
+    return results
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print('%-8s %-10s %-6s %12s' % ('handler', 'logger', 'style', 'us/write'))
+    for handler_name, scenario, name, per_call in run(iterations):
+        print('%-8s %-10s %-6s %12.2f' % (handler_name, scenario, name, per_call))
@@ -0,0 +1,110 @@
+"""
+Measure the start-up costs of a worker process: importing djangbone's view
+modules (in fresh interpreters, after Django itself has been set up), the
+first request to a new view class (which builds its cached metadata) compared
+with later ones, and building a view's ViewMetadata compared with looking up
+the cached copy that every request uses:
+
+    python -m djangbone.benchmarks.startup [repeat]
+"""
+import os
+import subprocess
+import sys
+import time
+
+from djangbone.benchmarks import suite
+
+
+IMPORT_SCRIPT = """
+import time
+from djangbone.benchmarks import suite
+suite.configure(migrate=False)
+start = time.perf_counter()
+import djangbone.views, djangbone.async_views, djangbone.batch, djangbone.events
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def median(values):
+    return suite.percentile(values, 0.5)
+
+
+def time_imports(repeat):
+    """
+    Return the median time (in ms) to import the view modules in a new
+    interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT], env=env)
+        timings.append(float(output.decode('ascii').strip().splitlines()[-1]))
+    return median(timings)
+
+
+def time_requests(repeat):
+    """
+    Return the time (in ms) of the first single item GET to a new view class,
+    and the median time of the following ones.
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.test.client import RequestFactory
+
+    base = suite.get_views(page_size=50)['ModelAPIView']
+    view = type('StartupView', (base,), {}).as_view()
+    id = str(suite.seeded_users().order_by('pk').values_list('pk', flat=True)[0])
+    factory = RequestFactory()
+    timings = []
+    for _ in range(repeat + 1):
+        request = factory.get('/users/1')
+        request.user = AnonymousUser()
+        start = time.perf_counter()
+        view(request, id=id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings[0], median(timings[1:])
+
+
+def time_metadata(iterations):
+    """
+    Return the time (in us) to build a view's ViewMetadata, and to look up
+    the cached one.
+    """
+    from djangbone.views import ViewMetadata
+    view_class = suite.get_views(page_size=50)['ModelAPIView']
+    view = view_class()
+    model, fields = view.base_queryset.model, tuple(view.serialize_fields)
+    timings = []
+    for func in (lambda: ViewMetadata(view_class, model, fields), view.get_metadata):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        timings.append((time.perf_counter() - start) / iterations * 1e6)
+    return timings
+
+
+def run(repeat=10, rows=100):
+    """
+    Seed the database and run the measurements, returning a list of
+    (name, value) pairs. The seeded rows are deleted afterwards.
+    """
+    suite.seed(rows)
+    try:
+        first, warm = time_requests(repeat)
+        build, lookup = time_metadata(repeat * 1000)
+    finally:
+        suite.unseed()
+    return [
+        ('import views (ms)', time_imports(repeat)),
+        ('first request (ms)', first),
+        ('later requests (ms)', warm),
+        ('build metadata (us)', build),
+        ('cached metadata (us)', lookup),
+    ]
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    suite.configure()
+    for name, value in run(repeat):
+        print('%-24s %10.3f' % (name, value))
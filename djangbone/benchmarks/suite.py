@@ -0,0 +1,250 @@
+"""
+Benchmarks for the request paths of ModelAPIView and CustomModelAPIView,
+run through RequestFactory against a seeded SQLite database.
+
+Each scenario is run repeatedly, and reports latency percentiles (in ms), the
+number of queries per request, and the peak memory allocated while handling
+one request (measured separately with tracemalloc, which slows things down).
+Results can be saved as a JSON baseline and later compared against.
+"""
+import json
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+
+
+# Usernames of the rows the benchmarks create start with this, so that they can
+# be told apart from (and never touch) any other rows in the database:
+SEED_PREFIX = 'djangbone-bench-'
+
+
+def configure(database_name=':memory:', migrate=True):
+    """
+    Configure standalone Django settings with a SQLite database, unless
+    settings have already been configured (eg. by a host project), and
+    create the tables unless migrate is False.
+    """
+    if not settings.configured:
+        settings.configure(
+            DEBUG=False,
+            SECRET_KEY='djangbone-benchmarks',
+            INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'djangbone'],
+            DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': database_name}},
+            DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+            USE_TZ=True,
+        )
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0, interactive=False)
+
+
+def seeded_users():
+    """
+    Return a queryset of the User rows created by the benchmarks.
+    """
+    from django.contrib.auth.models import User
+    return User.objects.filter(username__startswith=SEED_PREFIX)
+
+
+def seed(rows):
+    """
+    Create the given number of User rows for the benchmarks, replacing any
+    left over from a previous run. Other users are left alone.
+    """
+    from django.contrib.auth.models import User
+    unseed()
+    User.objects.bulk_create([User(username='%suser%s' % (SEED_PREFIX, i), first_name='First %s' % i,
+            last_name='Last %s' % (i % 50), email='user%s@example.com' % i) for i in range(rows)], batch_size=1000)
+
+
+def unseed():
+    """
+    Delete the User rows created by the benchmarks.
+    """
+    seeded_users().delete()
+
+
+def get_views(page_size):
+    """
+    Return a dict of {name: view class} for the benchmarked views. Views are
+    built here rather than at import time since they need Django to be set up.
+    """
+    from django import forms
+    from django.contrib.auth.models import User
+    from djangbone.views import CustomModelAPIView, ModelAPIView
+
+    class UserForm(forms.ModelForm):
+        class Meta:
+            model = User
+            fields = ('username', 'first_name', 'last_name', 'email')
+
+    attrs = {
+        'base_queryset': seeded_users().order_by('pk'),
+        'serialize_fields': ('id', 'username', 'first_name', 'last_name', 'email', 'date_joined'),
+        'add_form_class': UserForm,
+        'edit_form_class': UserForm,
+    }
+    views = {}
+    for base in (ModelAPIView, CustomModelAPIView):
+        views[base.__name__] = type('Benchmark' + base.__name__, (base,), dict(attrs))
+        views[base.__name__ + '/paginated'] = type('BenchmarkPaginated' + base.__name__, (base,),
+                dict(attrs, page_size=page_size))
+    return views
+
+
+def get_scenarios(rows, page_size):
+    """
+    Return a list of (name, view name, request builder) tuples. Each builder
+    takes a RequestFactory and returns (request, view kwargs).
+    """
+    from django.contrib.auth.models import User
+    users = seeded_users().order_by('pk')
+    last_page = max(1, (rows + page_size - 1) // page_size)
+    counter = [0]
+
+    def next_id():
+        counter[0] += 1
+        return counter[0]
+
+    def single_id():
+        return str(users.values_list('pk', flat=True)[rows // 2])
+
+    def collection(factory):
+        return factory.get('/users/'), {}
+
+    def first_page(factory):
+        return factory.get('/users/'), {}
+
+    def deep_page(factory):
+        return factory.get('/users/', {'p': last_page}), {}
+
+    def single(factory):
+        return factory.get('/users/1'), {'id': single_id()}
+
+    def post(factory):
+        body = json.dumps({'username': '%snew%s' % (SEED_PREFIX, next_id()), 'first_name': 'New', 'last_name': 'User',
+                'email': 'new@example.com'})
+        return factory.post('/users/', body, content_type='application/json'), {}
+
+    def put(factory):
+        body = json.dumps({'username': '%schanged%s' % (SEED_PREFIX, next_id()), 'first_name': 'Changed', 'last_name': 'User',
+                'email': 'changed@example.com'})
+        return factory.put('/users/1', body, content_type='application/json'), {'id': single_id()}
+
+    def delete(factory):
+        # Delete the newest row, so that the seeded rows that other scenarios use are left alone:
+        User.objects.create(username='%sdelete%s' % (SEED_PREFIX, next_id()))
+        id = str(users.reverse().values_list('pk', flat=True)[0])
+        return factory.delete('/users/1'), {'id': id}
+
+    scenarios = []
+    for view in ('ModelAPIView', 'CustomModelAPIView'):
+        scenarios.extend([
+            ('collection', view, collection),
+            ('collection (first page)', view + '/paginated', first_page),
+            ('collection (page %s)' % last_page, view + '/paginated', deep_page),
+            ('single item', view, single),
+            ('post', view, post),
+            ('put', view, put),
+            ('delete', view, delete),
+        ])
+    return scenarios
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def run(rows=1000, page_size=50, repeat=50, warmup=5):
+    """
+    Seed the database and run every scenario, returning a dict of
+    {scenario name: {'p50': ms, 'p90': ms, 'p99': ms, 'mean': ms, 'queries': n, 'peak_kb': kb}}.
+    The seeded rows (and any the scenarios create) are deleted afterwards.
+    """
+    seed(rows)
+    try:
+        return run_scenarios(rows, page_size, repeat, warmup)
+    finally:
+        unseed()
+
+
+def run_scenarios(rows, page_size, repeat, warmup):
+    from django.contrib.auth.models import AnonymousUser
+    from django.db import connection
+    from django.test.client import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    factory = RequestFactory()
+    views = dict((name, view.as_view()) for name, view in get_views(page_size).items())
+
+    def call(view, request, kwargs):
+        request.user = AnonymousUser()
+        start = time.perf_counter()
+        response = view(request, **kwargs)
+        if response.streaming:
+            for chunk in response.streaming_content:
+                pass
+        return (time.perf_counter() - start) * 1000, response
+
+    results = {}
+    for name, view_name, builder in get_scenarios(rows, page_size):
+        view = views[view_name]
+        # Requests are built (which may query or write setup rows) outside the measurements:
+        for _ in range(warmup):
+            call(view, *builder(factory))
+        timings = [call(view, *builder(factory))[0] for _ in range(repeat)]
+
+        request, kwargs = builder(factory)
+        with CaptureQueriesContext(connection) as queries:
+            response = call(view, request, kwargs)[1]
+        request, kwargs = builder(factory)
+        tracemalloc.start()
+        call(view, request, kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results['%s: %s' % (view_name.split('/')[0], name)] = {
+            'p50': round(percentile(timings, 0.5), 3),
+            'p90': round(percentile(timings, 0.9), 3),
+            'p99': round(percentile(timings, 0.99), 3),
+            'mean': round(sum(timings) / len(timings), 3),
+            'queries': len(queries),
+            'peak_kb': round(peak / 1024.0, 1),
+            'status': response.status_code,
+        }
+    return results
+
+
+def compare(results, baseline, threshold=1.2):
+    """
+    Compare results with a baseline, returning a list of regression messages:
+    any scenario whose p50 latency or peak memory grew by more than threshold
+    times, or that makes more queries than before.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in ('p50', 'peak_kb'):
+            if old[metric] and result[metric] > old[metric] * threshold:
+                regressions.append('%s: %s went from %s to %s' % (name, metric, old[metric], result[metric]))
+        if result['queries'] > old['queries']:
+            regressions.append('%s: queries went from %s to %s' % (name, old['queries'], result['queries']))
+    return regressions
+
+
+def format_results(results, baseline=None):
+    lines = ['%-48s %9s %9s %9s %8s %10s' % ('scenario', 'p50 ms', 'p90 ms', 'p99 ms', 'queries', 'peak KB')]
+    for name, result in sorted(results.items()):
+        line = '%-48s %9.2f %9.2f %9.2f %8d %10.1f' % (name, result['p50'], result['p90'], result['p99'],
+                result['queries'], result['peak_kb'])
+        if baseline and name in baseline and baseline[name]['p50']:
+            line += '  (%+.0f%% p50)' % ((result['p50'] / baseline[name]['p50'] - 1) * 100)
+        lines.append(line)
+    return '\n'.join(lines)
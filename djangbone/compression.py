@@ -0,0 +1,107 @@
+import zlib
+
+from djangbone.encoders import import_optional, parse_qualities
+
+
+def get_quality(accept_encoding, encoding):
+    """
+    Return the q-value that an Accept-Encoding header gives a content coding
+    (falling back to '*'), or 0 if the coding isn't acceptable.
+    """
+    qualities = parse_qualities(accept_encoding)
+    return qualities.get(encoding, qualities.get('*', 0.0))
+
+
+class Compressor(object):
+    """
+    Interface for the content codings that BackboneAPIView can compress
+    response bodies with (see BackboneAPIView.compressors). An instance
+    compresses a single response, either all at once with compress(), or
+    chunk by chunk with compress_stream().
+    """
+    encoding = None             # Content-Encoding header value
+    module_name = None          # Name of an optional library this compressor needs, if any
+
+    @classmethod
+    def is_available(cls):
+        return cls.module_name is None or import_optional(cls.module_name) is not None
+
+    def process(self, data, flush=False):
+        """
+        Compress a chunk of data, returning whatever compressed output is ready
+        (all of it, if flush is True).
+        """
+        raise NotImplementedError
+
+    def finish(self):
+        """
+        Return the rest of the compressed output, ending the stream.
+        """
+        raise NotImplementedError
+
+    def compress(self, data):
+        return self.process(data) + self.finish()
+
+    def compress_stream(self, chunks):
+        """
+        Compress an iterable of chunks, flushing after each one so that
+        clients can start decoding before the response has been generated.
+        """
+        for chunk in chunks:
+            output = self.process(chunk, flush=True)
+            if output:
+                yield output
+        yield self.finish()
+
+    async def acompress_stream(self, chunks):
+        """
+        Async version of compress_stream(), for async streaming responses.
+        """
+        async for chunk in chunks:
+            output = self.process(chunk, flush=True)
+            if output:
+                yield output
+        yield self.finish()
+
+
+class GzipCompressor(Compressor):
+    """
+    gzip, using the standard library's zlib module.
+    """
+    encoding = 'gzip'
+    level = 6
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data, flush=False):
+        output = self.compressor.compress(data)
+        if flush:
+            output += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return output
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor(Compressor):
+    """
+    Brotli, which compresses JSON better than gzip at a similar speed, using
+    the brotli library.
+    """
+    encoding = 'br'
+    module_name = 'brotli'
+    quality = 5                 # 0-11; higher levels are too slow for compressing on every request
+
+    def __init__(self):
+        brotli = import_optional('brotli')
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+
+    def process(self, data, flush=False):
+        output = self.compressor.process(data)
+        if flush:
+            output += self.compressor.flush()
+        return output
+
+    def finish(self):
+        return self.compressor.finish()
@@ -0,0 +1,193 @@
+import datetime
+import importlib
+import json
+
+
+_optional_modules = {}
+
+def import_optional(name):
+    """
+    Import and return an optional dependency, or None if it isn't installed.
+    The result is remembered, so that the import is only attempted once.
+    """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+def parse_qualities(header):
+    """
+    Parse an Accept or Accept-Encoding header into a { value: q-value } dict,
+    eg. { 'application/json': 1.0, '*/*': 0.1 }. Values are lowercased, and
+    q-values that aren't numbers count as 0.
+    """
+    qualities = {}
+    for item in header.split(','):
+        parts = item.strip().split(';')
+        value, quality = parts[0].strip().lower(), 1.0
+        for param in parts[1:]:
+            name, _, param_value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            qualities[value] = quality
+    return qualities
+
+
+def encode_default(obj):
+    """
+    Convert objects that JSON (or MessagePack) can't represent to strings:
+    ISO 8601 for datetimes, dates and times, and str() for everything else
+    (including Decimal and UUID instances).
+
+    orjson and msgpack pass subclasses of the builtin types here too (see
+    their backends), since they'd otherwise read their internal storage
+    directly: form errors (an ErrorDict of ErrorLists) would be encoded as
+    empty lists. They're converted to the plain types instead.
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, (list, tuple)):
+        return list(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    if isinstance(obj, str):
+        return str.__str__(obj)
+    return str(obj)
+
+
+class DjangboneJSONEncoder(json.JSONEncoder):
+    """
+    JSON encoder that converts additional Python types to JSON.
+
+    datetime, date and time instances become ISO 8601 strings, and any other
+    unsupported objects (eg. Decimal or UUID instances) are converted with str().
+    """
+    def default(self, obj):
+        return encode_default(obj)
+
+
+class EncoderBackend(object):
+    """
+    Interface for the formats that BackboneAPIView can use for request and
+    response bodies.
+    """
+    content_type = None         # Content type of encoded bodies
+    content_types = ()          # All the content types this backend recognizes in Accept/Content-Type headers
+    module_name = None          # Name of an optional library this backend needs, if any
+    streamable = False          # Whether collections can be streamed as a JSON array with this backend
+
+    @classmethod
+    def is_available(cls):
+        return cls.module_name is None or import_optional(cls.module_name) is not None
+
+    @classmethod
+    def accepts(cls, content_type):
+        """
+        Return True if a Content-Type header value is one of this backend's
+        content types.
+        """
+        return content_type.split(';')[0].strip().lower() in cls.content_types
+
+    @classmethod
+    def quality(cls, qualities, wildcards=True):
+        """
+        Return the highest q-value that an Accept header (parsed with
+        parse_qualities()) gives one of this backend's content types, or 0 if
+        none is acceptable. The most specific matching media range counts, and
+        with wildcards=False only content types named explicitly do.
+        """
+        best = 0.0
+        for content_type in cls.content_types:
+            media_ranges = (content_type, content_type.split('/')[0] + '/*', '*/*') if wildcards else (content_type,)
+            for media_range in media_ranges:
+                if media_range in qualities:
+                    best = max(best, qualities[media_range])
+                    break
+        return best
+
+    def encode(self, data):
+        """
+        Encode data to bytes.
+        """
+        raise NotImplementedError
+
+    def decode(self, body):
+        """
+        Decode a request body (bytes) to Python data, raising ValueError if it
+        is malformed.
+        """
+        raise NotImplementedError
+
+
+class JSONBackend(EncoderBackend):
+    """
+    JSON using the standard library's json module, via the given encoder and
+    decoder instances (see BackboneAPIView.json_encoder and json_decoder).
+    """
+    content_type = 'application/json'
+    content_types = ('application/json',)
+    streamable = True
+
+    def __init__(self, encoder=None, decoder=None):
+        self.encoder = encoder or DjangboneJSONEncoder()
+        self.decoder = decoder or json.JSONDecoder()
+
+    def encode(self, data):
+        return self.encoder.encode(data).encode('utf-8')
+
+    def decode(self, body):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        return self.decoder.decode(body)
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    JSON using orjson, which is much faster than the standard library. The
+    output is the same as DjangboneJSONEncoder's, apart from whitespace.
+    """
+    module_name = 'orjson'
+
+    def __init__(self):
+        self.orjson = import_optional('orjson')
+
+    def encode(self, data):
+        return self.orjson.dumps(data, default=encode_default,
+                option=self.orjson.OPT_NON_STR_KEYS | self.orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+    def decode(self, body):
+        try:
+            return self.orjson.loads(body)
+        except self.orjson.JSONDecodeError as e:
+            raise ValueError(str(e))
+
+
+class MsgpackBackend(EncoderBackend):
+    """
+    MessagePack, a compact binary format, using the msgpack library.
+    """
+    content_type = 'application/msgpack'
+    content_types = ('application/msgpack', 'application/x-msgpack')
+    module_name = 'msgpack'
+
+    def __init__(self):
+        self.msgpack = import_optional('msgpack')
+
+    def encode(self, data):
+        return self.msgpack.packb(data, default=encode_default, use_bin_type=True, strict_types=True)
+
+    def decode(self, body):
+        try:
+            return self.msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            # msgpack raises a variety of exceptions for malformed data:
+            raise ValueError(str(e))
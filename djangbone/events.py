@@ -0,0 +1,232 @@
+import collections
+import threading
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseForbidden, StreamingHttpResponse
+from django.views.generic import View
+
+from djangbone.encoders import DjangboneJSONEncoder
+
+
+class Broker(object):
+    """
+    Interface for the brokers that ModelAPIView publishes change events to
+    (see ModelAPIView.event_broker), and that EventStreamView reads them from.
+
+    Events are dicts, published to a channel (a string, eg. a model label),
+    and each one is given an id that's unique and increasing within the
+    channel. Ids are strings to clients, so brokers may use any format.
+    """
+    def publish(self, channel, event):
+        """
+        Publish an event to a channel, returning its id.
+        """
+        raise NotImplementedError
+
+    def last_event_id(self, channel):
+        """
+        Return the id of the latest event in a channel, or None if it has none.
+        """
+        raise NotImplementedError
+
+    def get_events(self, channel, after, timeout=None):
+        """
+        Return a list of the (id, event) pairs published to the channel after
+        the event with id after (or every event the broker still has, if after
+        is None), waiting up to timeout seconds for one if there are none yet.
+
+        Returns None if events after that id may have been missed (eg. the
+        broker no longer has them, or doesn't recognize the id).
+        """
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """
+    Broker that keeps the latest events of each channel in memory. It only
+    reaches clients connected to the same process, so it's suited to tests,
+    development and single process deployments.
+    """
+    def __init__(self, history=1000):
+        self.history = history      # Number of events kept per channel, for clients that reconnect
+        self.condition = threading.Condition()
+        self.channels = {}          # { channel: deque of (id, event) }
+        self.last_ids = {}          # { channel: id of its latest event }
+
+    def publish(self, channel, event):
+        with self.condition:
+            id = self.last_ids[channel] = self.last_ids.get(channel, 0) + 1
+            self.channels.setdefault(channel, collections.deque(maxlen=self.history)).append((id, event))
+            self.condition.notify_all()
+        return str(id)
+
+    def last_event_id(self, channel):
+        with self.condition:
+            return str(self.last_ids[channel]) if channel in self.last_ids else None
+
+    def get_events(self, channel, after, timeout=None):
+        try:
+            after = int(after) if after is not None else 0
+        except ValueError:
+            return None
+        with self.condition:
+            last_id = self.last_ids.get(channel, 0)
+            events = self.channels.get(channel, ())
+            if after > last_id or (events and after < events[0][0] - 1):
+                return None     # An id from before a restart, or events dropped from the history
+            self.condition.wait_for(lambda: self.last_ids.get(channel, 0) > after, timeout)
+            return [(str(id), event) for id, event in self.channels.get(channel, ()) if id > after]
+
+
+class EventStreamView(View):
+    """
+    Server-Sent Events endpoint that streams the change events of a
+    ModelAPIView subclass (view_class), so that Backbone clients can refetch
+    what changed instead of polling the collection, eg.
+
+        var source = new EventSource('/widgets/events');
+        source.onmessage = function(e) {
+            var change = JSON.parse(e.data);     // { "action": "update", "ids": [3] }
+            ...
+        };
+        source.addEventListener('reset', function() { widgets.fetch(); });
+
+    Browsers reconnect automatically, sending the Last-Event-ID header, and
+    get every event they missed in the meantime. If those events are no
+    longer available, a 'reset' event tells the client to refetch everything.
+
+    The request goes through view_class's dispatch() (so decorators on it,
+    such as login_required, apply), and each event only lists the ids that
+    the view's permission hooks let the user read. Deletions can't be
+    checked once the rows are gone, so they aren't sent to views that
+    override those hooks.
+
+    Each connection holds a worker thread (under ASGI, a thread pool thread
+    while it waits for events), so connections are closed after
+    max_duration seconds (clients reconnect without missing events).
+    """
+    view_class = None           # The ModelAPIView subclass whose changes are streamed
+    heartbeat = 15              # Seconds between keep-alive comments when there are no events
+    max_duration = 300          # Seconds after which the stream is closed, for the client to reconnect
+    retry = 3                   # Seconds browsers wait before reconnecting
+
+    json_encoder = DjangboneJSONEncoder()
+
+    def get(self, request, *args, **kwargs):
+        if self.view_class is None or self.view_class.event_broker is None:
+            raise ImproperlyConfigured('%s needs a view_class with an event_broker' % type(self).__name__)
+        view = self.view_class()
+        view.setup(request, *args, **kwargs)
+        # Dispatch the GET to the view as usual, but have it handled by streaming the events:
+        if view.view_is_async:
+            async def handler(request, *args, **kwargs):
+                return await sync_to_async(self.stream_response)(view, request)
+            view._get = handler
+            return async_to_sync(view.dispatch)(request, *args, **kwargs)
+        view._get = lambda request, *args, **kwargs: self.stream_response(view, request)
+        return view.dispatch(request, *args, **kwargs)
+
+    def stream_response(self, view, request):
+        """
+        Return the event stream response for the view's channel, starting
+        after the Last-Event-ID header's event if there is one.
+        """
+        if not view.user_has_collection_perm(request, 'read_collection'):
+            return HttpResponseForbidden()
+        channel = view.get_event_channel()
+        last_id = request.META.get('HTTP_LAST_EVENT_ID') or view.event_broker.last_event_id(channel)
+        if isinstance(request, ASGIRequest):
+            stream = self.astream(view, channel, last_id)
+        else:
+            stream = self.stream(view, channel, last_id)
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'     # Stop nginx from buffering the stream
+        return response
+
+    def stream(self, view, channel, last_id):
+        broker = view.event_broker
+        yield self.encode_event(None, None, retry=self.retry)
+        deadline = time.time() + self.max_duration
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            events = broker.get_events(channel, last_id, timeout=min(self.heartbeat, remaining))
+            if events is None:
+                last_id = broker.last_event_id(channel)
+                yield self.encode_event(last_id, {}, event_type='reset')
+            elif not events:
+                yield b': keep-alive\n\n'
+            else:
+                yield self.encode_events(view, events)
+                last_id = events[-1][0]
+
+    async def astream(self, view, channel, last_id):
+        """
+        Async version of stream(), for ASGI servers. Waiting for events runs in
+        a thread pool thread, and filtering them on the thread the ORM uses.
+        """
+        broker = view.event_broker
+        yield self.encode_event(None, None, retry=self.retry)
+        deadline = time.time() + self.max_duration
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            events = await sync_to_async(broker.get_events, thread_sensitive=False)(channel, last_id,
+                    timeout=min(self.heartbeat, remaining))
+            if events is None:
+                last_id = await sync_to_async(broker.last_event_id, thread_sensitive=False)(channel)
+                yield self.encode_event(last_id, {}, event_type='reset')
+            elif not events:
+                yield b': keep-alive\n\n'
+            else:
+                yield await sync_to_async(self.encode_events)(view, events)
+                last_id = events[-1][0]
+
+    def encode_events(self, view, events):
+        """
+        Encode a list of (id, event) pairs, after filtering them for the view's
+        user. Events that are filtered out entirely are sent as just their id,
+        which moves the client's Last-Event-ID on without dispatching anything.
+        """
+        chunks = []
+        for id, event in events:
+            chunks.append(self.encode_event(id, self.filter_event(view, event)))
+        return b''.join(chunks)
+
+    def filter_event(self, view, event):
+        """
+        Return the event with only the ids of the objects that the view's user
+        may read (according to its user_has_perm() and filter_queryset_for_user()),
+        or None if none are left.
+        """
+        metadata = view.get_metadata()
+        if not (metadata.checks_object_perms or metadata.filters_for_user):
+            return event
+        if event.get('action') == 'delete':
+            return None
+        queryset = view.get_queryset('read_single_item').filter(pk__in=event['ids'])
+        if metadata.checks_object_perms:
+            visible = set(str(obj.pk) for obj in queryset
+                    if view.user_has_perm(view.request, obj, 'read_single_item'))
+        else:
+            visible = set(str(pk) for pk in queryset.values_list('pk', flat=True))
+        ids = [id for id in event['ids'] if str(id) in visible]
+        return dict(event, ids=ids) if ids else None
+
+    def encode_event(self, id, event, event_type=None, retry=None):
+        lines = []
+        if retry is not None:
+            lines.append('retry: %d' % (retry * 1000))
+        if event_type:
+            lines.append('event: %s' % event_type)
+        if id is not None:
+            lines.append('id: %s' % id)
+        if event is not None:
+            lines.append('data: %s' % self.json_encoder.encode(event))
+        return ('\n'.join(lines) + '\n\n').encode('utf-8')
@@ -0,0 +1,139 @@
+import contextlib
+import logging
+import time
+
+from django.db import connections
+from django.dispatch import Signal
+
+
+# Sent by SignalSink after each instrumented request, with view, metrics and response arguments:
+request_metrics = Signal()
+
+
+class NullPhase(object):
+    """
+    Context manager that does nothing, for timing phases when instrumentation is off.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class NullMetrics(object):
+    """
+    Stand-in for RequestMetrics when a view has no instrumentation_sinks, so
+    that timing a phase costs a method call and nothing more.
+    """
+    enabled = False
+    _phase = NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+    def collect(self):
+        return self._phase
+
+NULL_METRICS = NullMetrics()
+
+
+class RequestMetrics(object):
+    """
+    Timings and database statistics for a single request.
+
+    timings maps phase names ('read', 'create', 'update', 'delete', 'serialize',
+    'encode' and 'total') to milliseconds. Phases can be nested, eg. 'serialize'
+    is part of 'read'. The body of a streamed response is encoded after the view
+    returns, so its encoding time and size aren't included.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.timings = {}
+        self.queries = 0
+        self.db_time = 0.0          # Milliseconds
+        self.response_bytes = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    @contextlib.contextmanager
+    def collect(self):
+        """
+        Time the whole request as the 'total' phase, counting the queries made
+        on every database connection.
+        """
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.execute_wrapper))
+            with self.phase('total'):
+                yield
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += (time.perf_counter() - start) * 1000
+
+    def finish(self, response):
+        if not response.streaming:
+            self.response_bytes = len(response.content)
+
+    def as_dict(self):
+        return {
+            'timings': dict((name, round(ms, 3)) for name, ms in self.timings.items()),
+            'queries': self.queries,
+            'db_time': round(self.db_time, 3),
+            'response_bytes': self.response_bytes,
+        }
+
+    def server_timing(self):
+        """
+        Return the metrics as a Server-Timing header value.
+        """
+        metrics = ['%s;dur=%.3f' % (name, ms) for name, ms in self.timings.items()]
+        metrics.append('db;dur=%.3f;desc="%d queries"' % (self.db_time, self.queries))
+        return ', '.join(metrics)
+
+
+class MetricsSink(object):
+    """
+    Interface for the destinations listed in BackboneAPIView.instrumentation_sinks.
+    """
+    def emit(self, view, metrics, response):
+        raise NotImplementedError
+
+class SignalSink(MetricsSink):
+    """
+    Send the request_metrics signal, with the view class as the sender.
+    """
+    def emit(self, view, metrics, response):
+        request_metrics.send(sender=type(view), view=view, metrics=metrics, response=response)
+
+class LoggerSink(MetricsSink):
+    """
+    Log the metrics for each request, eg. "GET /api/widgets/ WidgetView: {...}".
+    """
+    def __init__(self, logger_name='djangbone.metrics', level=logging.INFO):
+        self.logger = logging.getLogger(logger_name)
+        self.level = level
+
+    def emit(self, view, metrics, response):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%s %s %s: %s', view.request.method, view.request.path,
+                    type(view).__name__, metrics.as_dict())
+
+class ServerTimingSink(MetricsSink):
+    """
+    Add a Server-Timing header to the response, which browsers show in their
+    developer tools.
+    """
+    def emit(self, view, metrics, response):
+        response['Server-Timing'] = metrics.server_timing()
@@ -1,13 +1,46 @@
+import datetime
+import decimal
+import gzip
 import json
+import logging
+import threading
+import time
+import unittest
+import uuid
+from asgiref.sync import sync_to_async
 from django import forms
-from django.contrib.auth.models import User
+from django.apps import apps
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.conf import settings
+from django.db import connection
 from django.http import Http404
-from django.test.client import RequestFactory
-from django.utils import unittest
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.test.client import MULTIPART_CONTENT, RequestFactory
+from django.test.utils import CaptureQueriesContext
 
-from djangbone.views import BackboneAPIView
+from djangbone.async_views import AsyncBackboneAPIView, AsyncModelAPIView
+from djangbone.audit import AUDIT_LOGGER_NAME, start_audit_queue
+from djangbone.batch import BatchView
+from djangbone.benchmarks import startup as startup_benchmark, suite as benchmark_suite
+from djangbone.events import EventStreamView, InMemoryBroker
+from djangbone.encoders import DjangboneJSONEncoder, JSONBackend, MsgpackBackend, OrjsonBackend
+from djangbone.instrumentation import ServerTimingSink, SignalSink, request_metrics
+from djangbone.tombstones.models import Tombstone
+from djangbone.views import BackboneAPIView, ModelAPIView, CustomModelAPIView
 
 
+# The tests call views directly, but redirects (eg. to LOGIN_URL) need a urlconf:
+urlpatterns = []
+
 class AddUserForm(forms.ModelForm):
     """
     Simple ModelForm for testing POST requests.
@@ -39,16 +72,16 @@ class EditUserForm(forms.ModelForm):
         self.request = request
 
 
-class ReadOnlyView(BackboneAPIView):
+class ReadOnlyView(ModelAPIView):
     """
-    BackboneAPIView subclass for testing read-only functionality.
+    ModelAPIView subclass for testing read-only functionality.
     """
     base_queryset = User.objects.all()
     serialize_fields = ('id', 'username', 'first_name', 'last_name')
 
-class FullView(BackboneAPIView):
+class FullView(ModelAPIView):
     """
-    The subclass used to test BackboneAPIView's PUT/POST requests.
+    The subclass used to test ModelAPIView's PUT/POST requests.
     """
     base_queryset = User.objects.all()
     add_form_class = AddUserForm
@@ -56,26 +89,342 @@ class FullView(BackboneAPIView):
     serialize_fields = ('id', 'username', 'first_name', 'last_name')
     page_size = 2
 
+class StreamingView(ModelAPIView):
+    """
+    ModelAPIView subclass for testing streamed collection GETs.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username', 'first_name', 'last_name')
+    stream_collections = True
+    stream_chunk_size = 2
+
+class CustomStreamingView(CustomModelAPIView):
+    """
+    CustomModelAPIView subclass for testing streamed collection GETs.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username', 'first_name', 'last_name')
+    stream_collections = True
+    page_size = 2
+
+class CursorView(ModelAPIView):
+    """
+    ModelAPIView subclass for testing cursor pagination.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username')
+    page_size = 2
+    cursor_pagination = True
+    cursor_ordering = ('-last_name',)
+
+class CustomView(CustomModelAPIView):
+    """
+    CustomModelAPIView subclass with a many-to-many field in serialize_fields.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username', 'groups')
+
+class CustomItemView(CustomModelAPIView):
+    """
+    CustomModelAPIView subclass whose serialize_item() reads fields that aren't in serialize_fields.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username')
+
+    def serialize_item(self, item):
+        item_dict = super(CustomItemView, self).serialize_item(item)
+        item_dict['name'] = '%s %s' % (item.first_name, item.last_name)
+        return item_dict
+
+class ModelFullView(ModelAPIView):
+    """
+    ModelAPIView subclass supporting all operations, for testing query counts.
+    """
+    base_queryset = User.objects.all()
+    add_form_class = AddUserForm
+    edit_form_class = EditUserForm
+    serialize_fields = ('id', 'username', 'first_name', 'last_name')
+
+class DecoratedView(ModelFullView):
+    """
+    ModelAPIView subclass that customizes serialize_qs().
+    """
+    def serialize_qs(self, queryset, single_object=False):
+        data = super(DecoratedView, self).serialize_qs(queryset, single_object)
+        for item in ([data] if isinstance(data, dict) else data):
+            item['decorated'] = True
+        return data
+
+class BulkView(ModelFullView):
+    """
+    ModelAPIView subclass that accepts bulk requests on the collection url.
+    """
+    allow_bulk = True
+
+class ConditionalView(ModelAPIView):
+    """
+    ModelAPIView subclass for testing conditional GETs.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username')
+    conditional_get = True
+    modified_field = 'date_joined'
+
+class HashedConditionalView(ConditionalView):
+    """
+    Conditional GETs without a modified_field fall back to hashing the body.
+    """
+    modified_field = None
+
+class CachedView(ModelFullView):
+    """
+    ModelAPIView subclass that caches its GET responses.
+    """
+    cache_alias = 'djangbone-tests'
+
+class OwnerCachedView(CachedView):
+    """
+    CachedView subclass that only shows users themselves.
+    """
+    def filter_queryset_for_user(self, request, queryset, action=None):
+        return queryset.filter(pk=request.user.pk) if request.user.is_authenticated else queryset.none()
+
+class SyncView(ModelFullView):
+    """
+    ModelAPIView subclass supporting delta syncs (date_joined stands in for a
+    proper auto_now field here).
+    """
+    modified_field = 'date_joined'
+    delta_sync = True
+    sync_overlap = 0
+
+class RowPermissionView(ModelFullView):
+    """
+    ModelAPIView subclass that hides users whose last name is 'Two'.
+    """
+    def filter_queryset_for_user(self, request, queryset, action=None):
+        return queryset.exclude(last_name='Two')
+
+class DeniedConditionalView(ConditionalView):
+    """
+    ConditionalView subclass that hides users whose last name is 'Two', and
+    the collection when ?denied is given.
+    """
+    def user_has_perm(self, request, obj, action=None):
+        return obj.last_name != 'Two'
+
+    def user_has_collection_perm(self, request, action='read_collection'):
+        return 'denied' not in request.GET
+
+class LegacyPermissionView(ModelFullView):
+    """
+    ModelAPIView subclass that denies collection reads through user_has_perm(),
+    the way views did before user_has_collection_perm() existed.
+    """
+    def user_has_perm(self, request, obj, action=None):
+        return action != 'read_collection'
+
+class ObjectPermissionView(ModelFullView):
+    """
+    ModelAPIView subclass with an object permission check that assumes it's
+    given a real instance, and a collection permission check.
+    """
+    def user_has_perm(self, request, obj, action=None):
+        return action == 'create' or obj.last_name != 'Two'
+
+    def user_has_collection_perm(self, request, action='read_collection'):
+        return 'denied' not in request.GET
+
+
+class FilteredView(ModelFullView):
+    """
+    ModelAPIView subclass with GET filters, ordering and sparse fieldsets.
+    """
+    filter_fields = ('last_name', 'username__in', 'id__gte')
+    ordering_fields = ('username', 'last_name')
+    sparse_fields = True
+
+class CursorFilteredView(FilteredView):
+    """
+    FilteredView subclass with cursor pagination, which can be ordered by a
+    nullable field.
+    """
+    ordering_fields = ('username', 'last_login')
+    page_size = 2
+    cursor_pagination = True
+
+class InstrumentedView(ModelFullView):
+    """
+    ModelAPIView subclass that reports per-request metrics.
+    """
+    instrumentation_sinks = (ServerTimingSink(), SignalSink())
 
-class ViewTest(unittest.TestCase):
+class AsyncView(AsyncModelAPIView):
     """
-    Tests for BackboneAPIView.
+    AsyncModelAPIView subclass supporting all operations.
+    """
+    base_queryset = User.objects.order_by('pk')
+    add_form_class = AddUserForm
+    edit_form_class = EditUserForm
+    serialize_fields = ('id', 'username', 'first_name', 'last_name')
+
+class AsyncStreamingView(AsyncView):
+    """
+    AsyncModelAPIView subclass that streams its collections.
+    """
+    stream_collections = True
+    stream_chunk_size = 2
+
+class UserBatchView(BatchView):
+    """
+    BatchView with the views that sub-requests can use.
+    """
+    views = {
+        'users': ModelFullView,
+        'async-users': AsyncView,
+        'private-users': login_required(ModelFullView.as_view()),
+    }
+
+class RoutedView(ModelFullView):
+    """
+    ModelAPIView subclass that reads from a replica.
+    """
+    read_db_alias = 'replica'
+    write_db_alias = 'default'
+    read_your_writes = 60
+    lock_for_update = True
+
+class WriteRouter(object):
+    """
+    Database router that sends every write to the replica.
+    """
+    def db_for_write(self, model, **hints):
+        return 'replica'
+
+class CountView(ModelFullView):
+    """
+    Paginated ModelAPIView subclass that sends the collection's total count.
+    """
+    page_size = 1
+    total_count = 'exact'
+
+class CachedCountView(CountView):
+    """
+    CountView with cached counts.
+    """
+    total_count = 'cached'
+
+class EstimatedCountView(CountView):
+    """
+    CountView with estimated counts.
+    """
+    total_count = 'estimated'
+
+class ParsingView(ModelFullView):
+    """
+    ModelAPIView subclass with request body limits.
+    """
+    max_body_size = 200
+    stream_uploads_to_disk = True
+
+class ValidatedView(ModelAPIView):
+    """
+    ModelAPIView subclass that validates writes without forms.
+    """
+    base_queryset = User.objects.all()
+    serialize_fields = ('id', 'username', 'first_name', 'last_name')
+    validate_fields = ('username', 'first_name', 'last_name')
+
+class ChangedResponseView(ModelFullView):
+    """
+    ModelAPIView subclass that returns only the changed fields after a PUT.
+    """
+    write_response = 'changed'
+
+class CompressedView(StreamingView):
+    """
+    ModelAPIView subclass that compresses responses.
+    """
+    add_form_class = AddUserForm
+    compress_min_size = 200
+
+class EventView(ModelFullView):
+    """
+    ModelAPIView subclass that publishes change events.
+    """
+    event_broker = InMemoryBroker()
+
+class UserEventStreamView(EventStreamView):
+    """
+    EventStreamView for EventView's changes.
+    """
+    view_class = EventView
+    heartbeat = 0.01
+
+class PrivateEventView(EventView):
+    """
+    EventView subclass for logged in users, who can only see themselves.
+    """
+    @method_decorator(login_required)
+    def dispatch(self, request, *args, **kwargs):
+        return super(PrivateEventView, self).dispatch(request, *args, **kwargs)
+
+    def filter_queryset_for_user(self, request, queryset, action=None):
+        return queryset.filter(pk=request.user.pk)
+
+class PrivateEventStreamView(UserEventStreamView):
+    """
+    EventStreamView for PrivateEventView's changes.
+    """
+    view_class = PrivateEventView
+
+
+class ViewTestMixin(object):
+    """
+    Mixin for test cases that call views directly, with requests built by
+    request(). Override create_users() to change the users created for each test.
 
     Note that django.contrib.auth must be in INSTALLED_APPS for these to work.
     """
     def setUp(self):
         self.factory = RequestFactory()
-        self.view = ReadOnlyView.as_view()
-        self.writable_view = FullView.as_view()
-        self.user1 = User.objects.create(username='test1', first_name='Test', last_name='One')
+        self.create_users()
 
-    def tearDown(self):
-        User.objects.all().delete()
+    def create_users(self):
+        self.user1 = User.objects.create(username='test1', first_name='Test', last_name='One')
 
     def add_two_more_users(self):
         self.user2 = User.objects.create(username='test2', first_name='Test', last_name='Two')
         self.user3 = User.objects.create(username='test3', first_name='Test', last_name='Three')
 
+    def request(self, method, path, body=None, user=None, **extra):
+        """
+        Build a request from user (an anonymous one by default). For GETs, body
+        holds the query parameters. Other methods send it as JSON, encoding it
+        first unless it's a string, or as it is if a content_type is given.
+        """
+        if body is None:
+            request = getattr(self.factory, method)(path, **extra)
+        elif method == 'get' or 'content_type' in extra:
+            request = getattr(self.factory, method)(path, body, **extra)
+        else:
+            if not isinstance(body, (str, bytes)):
+                body = json.dumps(body)
+            request = getattr(self.factory, method)(path, body, content_type='application/json', **extra)
+        request.user = user or AnonymousUser()
+        return request
+
+
+class ViewTest(ViewTestMixin, TestCase):
+    """
+    Tests for ModelAPIView's basic operations.
+    """
+    def setUp(self):
+        super(ViewTest, self).setUp()
+        self.view = ReadOnlyView.as_view()
+        self.writable_view = FullView.as_view()
+        self.id = str(self.user1.id)
+
     def test_collection_get(self):
         request = self.factory.get('/users/')
         response = self.view(request)
@@ -83,7 +432,7 @@ class ViewTest(unittest.TestCase):
         response_data = json.loads(response.content)
 
         # Ensure response json deserializes to a 1-item list:
-        self.assert_(isinstance(response_data, list))
+        self.assertTrue(isinstance(response_data, list))
         self.assertEqual(len(response_data), 1)
         self.assertEqual(response_data[0]['username'], self.user1.username)
 
@@ -92,7 +441,7 @@ class ViewTest(unittest.TestCase):
         response = self.view(request)
         self.assertEqual(response.status_code, 200)
         response_data = json.loads(response.content)
-        self.assert_(isinstance(response_data, list))
+        self.assertTrue(isinstance(response_data, list))
         self.assertEqual(len(response_data), 3)
         # With User model's default ordering (by id), user3 should be last:
         self.assertEqual(response_data[2]['username'], self.user3.username)
@@ -101,7 +450,7 @@ class ViewTest(unittest.TestCase):
         response = self.writable_view(request)
         self.assertEqual(response.status_code, 200)
         response_data = json.loads(response.content)
-        self.assert_(isinstance(response_data, list))
+        self.assertTrue(isinstance(response_data, list))
         self.assertEqual(len(response_data), 2)
 
         # Page 2 should only have one item:
@@ -109,91 +458,1101 @@ class ViewTest(unittest.TestCase):
         response = self.writable_view(request)
         self.assertEqual(response.status_code, 200)
         response_data = json.loads(response.content)
-        self.assert_(isinstance(response_data, list))
+        self.assertTrue(isinstance(response_data, list))
         self.assertEqual(len(response_data), 1)
 
     def test_single_item_get(self):
-        request = self.factory.get('/users/1')
-        response = self.view(request, id='1')   # Simulate a urlconf passing in the 'id' kwarg
+        request = self.factory.get('/users/%s' % self.id)
+        response = self.view(request, id=self.id)   # Simulate a urlconf passing in the 'id' kwarg
         self.assertEqual(response.status_code, 200)
         response_data = json.loads(response.content)
-        self.assert_(isinstance(response_data, dict))
+        self.assertTrue(isinstance(response_data, dict))
         self.assertEqual(response_data['username'], self.user1.username)
 
-        # Ensure 404s are raised for non-existent items:
-        request = self.factory.get('/users/7')
-        self.assertRaises(Http404, lambda: self.view(request, id='7'))
+        # Ensure 404s are returned for non-existent items:
+        request = self.factory.get('/users/0')
+        self.assertEqual(self.view(request, id='0').status_code, 404)
 
     def test_post(self):
-        request = self.factory.post('/users')
+        request = self.request('post', '/users', '{"username": "post_test"}')
         response = self.view(request)
-        self.assertEqual(response.status_code, 405)     # "Method not supported" if no add_form_class specified
+        self.assertEqual(response.status_code, 501)     # "Not implemented" if no add_form_class specified
 
-        # Testing BackboneAPIView subclasses that support POST via add_form_class:
+        # Testing ModelAPIView subclasses that support POST via add_form_class:
 
         # If no JSON provided in POST body, return HTTP 400:
-        response = self.writable_view(request)
+        response = self.writable_view(self.request('post', '/users', ''))
         self.assertEqual(response.status_code, 400)
 
         # Test the case where invalid input is given (leading to form errors):
-        request = self.factory.post('/users', '{"wrong_field": "xyz"}', content_type='application/json')
+        request = self.request('post', '/users', '{"wrong_field": "xyz"}')
         response = self.writable_view(request)
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content, 'ERROR: validation failed')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), { 'error': { 'username': ['This field is required.'] } })
 
         # If valid JSON was provided, a new instance should be created:
-        request = self.factory.post('/users', '{"username": "post_test"}', content_type='application/json')
+        request = self.request('post', '/users', '{"username": "post_test"}')
         response = self.writable_view(request)
         self.assertEqual(response.status_code, 200)
-        self.assert_(User.objects.get(username='post_test'))
+        self.assertTrue(User.objects.get(username='post_test'))
         response_json = json.loads(response.content)
         self.assertEqual(response_json['username'], 'post_test')
 
     def test_put(self):
-        request = self.factory.put('/users/1')
-        response = self.view(request, id='1')
-        self.assertEqual(response.status_code, 405)     # "Method not supported" if no edit_form_class specified
+        request = self.request('put', '/users/%s' % self.id, '{"username": "put_test"}')
+        response = self.view(request, id=self.id)
+        self.assertEqual(response.status_code, 501)     # "Not implemented" if no edit_form_class specified
 
-        # PUT is also not supported for collections (when no id is provided):
-        request = self.factory.put('/users')
-        response = self.writable_view(request)
-        self.assertEqual(response.status_code, 405)
+        # PUT is also not supported for collections (unless a list is sent for a bulk update):
+        request = self.request('put', '/users', '{"username": "put_test"}')
+        self.assertRaises(Http404, lambda: self.writable_view(request))
 
         # If no JSON in PUT body, return HTTP 400:
-        response = self.writable_view(request, id='1')
+        response = self.writable_view(self.request('put', '/users/%s' % self.id, ''), id=self.id)
         self.assertEqual(response.status_code, 400)
 
-        # Raise 404 if an object with the given id doesn't exist:
-        request = self.factory.put('/users/27', '{"username": "put_test"}', content_type='application/json')
-        self.assertRaises(Http404, lambda: self.writable_view(request, id='27'))
+        # Return a 404 if an object with the given id doesn't exist:
+        request = self.request('put', '/users/0', '{"username": "put_test"}')
+        self.assertEqual(self.writable_view(request, id='0').status_code, 404)
 
         # If the object exists and an edit_form_class is supplied, it actually does something:
-        request = self.factory.put('/users/1', '{"username": "put_test"}', content_type='application/json')
-        response = self.writable_view(request, id='1')
+        request = self.request('put', '/users/%s' % self.id, '{"username": "put_test"}')
+        response = self.writable_view(request, id=self.id)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(User.objects.get(id=1).username, 'put_test')
+        self.assertEqual(User.objects.get(id=self.user1.id).username, 'put_test')
         response_json = json.loads(response.content)
         self.assertEqual(response_json['username'], 'put_test')
 
         # Test the case where invalid input is given (leading to form errors):
-        request = self.factory.put('/users/1', '{"wrong_field": "xyz"}', content_type='application/json')
-        response = self.writable_view(request, id='1')
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content, 'ERROR: validation failed')
+        request = self.request('put', '/users/%s' % self.id, '{"wrong_field": "xyz"}')
+        response = self.writable_view(request, id=self.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), { 'error': { 'username': ['This field is required.'] } })
 
     def test_delete(self):
         # Delete is not supported for collections:
-        request = self.factory.delete('/users')
+        request = self.request('delete', '/users')
         response = self.view(request)
         self.assertEqual(response.status_code, 405)
-        self.assertEqual(User.objects.filter(id=1).count(), 1)
+        self.assertEqual(User.objects.filter(id=self.user1.id).count(), 1)
 
         # But it is supported for single items (specified by id):
-        request = self.factory.delete('/users/1')
-        response = self.view(request, id='1')
+        request = self.request('delete', '/users/%s' % self.id)
+        response = self.view(request, id=self.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.filter(id=self.user1.id).count(), 0)
+
+        # Should return a 404 if we try to access a deleted resource again:
+        request = self.request('delete', '/users/%s' % self.id)
+        self.assertEqual(self.view(request, id=self.id).status_code, 404)
+
+
+class CollectionTest(ViewTestMixin, TestCase):
+    """
+    Tests for streamed, cursor-paginated and custom-serialized collections.
+    """
+    def test_streamed_collection_get(self):
+        self.add_two_more_users()
+        request = self.factory.get('/users/')
+        response = StreamingView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        response_data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([u['username'] for u in response_data], ['test1', 'test2', 'test3'])
+
+        # Pagination still applies to streamed responses:
+        request = self.factory.get('/users/?p=2')
+        response = CustomStreamingView.as_view()(request)
+        response_data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([u['username'] for u in response_data], ['test3'])
+
+        # An empty collection streams as an empty JSON array:
+        request = self.factory.get('/users/?p=3')
+        response = CustomStreamingView.as_view()(request)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+    def test_cursor_pagination(self):
+        self.add_two_more_users()
+        view = CursorView.as_view()
+        # Ordered by descending last_name: Two, Three, One
+        response = view(self.factory.get('/users/'))
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['test2', 'test3'])
+        self.assertTrue(response['Link'].endswith('rel="next"'))
+
+        # The cursor from the first page leads to the second (and last) page:
+        request = self.factory.get('/users/', {'cursor': response['X-Next-Cursor']})
+        response = view(request)
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['test1'])
+        self.assertFalse(response.has_header('X-Next-Cursor'))
+
+        # Invalid or tampered cursors fall back to the first page, like bad page numbers:
+        for cursor in ('garbage', CursorView().encode_cursor(['-last_name', 'id'], ['One', 1]) + 'x'):
+            response = view(self.factory.get('/users/', {'cursor': cursor}))
+            self.assertEqual([u['username'] for u in json.loads(response.content)], ['test2', 'test3'])
+
+    def test_custom_serialization_query_count(self):
+        group = Group.objects.create(name='testers')
+        self.add_two_more_users()
+        for user in User.objects.all():
+            user.groups.add(group)
+        request = self.factory.get('/users/')
+        with CaptureQueriesContext(connection) as first_queries:
+            response = CustomView.as_view()(request)
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data[0], {'id': self.user1.id, 'username': 'test1', 'groups': [group.id]})
+
+        # The number of queries doesn't grow with the number of rows:
+        User.objects.create(username='test4').groups.add(group)
+        with CaptureQueriesContext(connection) as second_queries:
+            response = CustomView.as_view()(request)
+        self.assertEqual(len(json.loads(response.content)), 4)
+        self.assertEqual(len(second_queries), len(first_queries))
+
+
+class ConditionalGetTest(ViewTestMixin, TestCase):
+    """
+    Tests for ETag and Last-Modified validation of GETs.
+    """
+    def test_conditional_get(self):
+        for view_class in (ConditionalView, HashedConditionalView):
+            view = view_class.as_view()
+            response = view(self.factory.get('/users/'))
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+            response = view(self.factory.get('/users/', HTTP_IF_NONE_MATCH=etag))
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+            # Any change to the collection changes the ETag:
+            self.add_two_more_users()
+            response = view(self.factory.get('/users/', HTTP_IF_NONE_MATCH=etag))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(json.loads(response.content)), 3)
+            User.objects.exclude(id=self.user1.id).delete()
+
+        # Collections have no Last-Modified, which wouldn't change when rows are deleted:
+        view = ConditionalView.as_view()
+        self.add_two_more_users()
+        response = view(self.factory.get('/users/'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        User.objects.exclude(id=self.user1.id).delete()
+        response = view(self.factory.get('/users/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)))
+        self.assertEqual(len(json.loads(response.content)), 1)
+        self.assertTrue(view(self.factory.get('/users/1'), id=str(self.user1.id)).has_header('Last-Modified'))
+
+        # With a modified_field, a 304 doesn't need to read the rows at all:
+        etag = view(self.factory.get('/users/1'), id=str(self.user1.id))['ETag']
+        request = self.factory.get('/users/1', HTTP_IF_NONE_MATCH=etag)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, id=str(self.user1.id))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+
+class EncoderTest(ViewTestMixin, TestCase):
+    """
+    Tests for the JSON and msgpack encoder backends, and content negotiation.
+    """
+    def test_encoder_types(self):
+        data = {
+            'datetime': datetime.datetime(2012, 3, 4, 5, 6, 7),
+            'date': datetime.date(2012, 3, 4),
+            'time': datetime.time(5, 6, 7),
+            'decimal': decimal.Decimal('1.50'),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+        }
+        expected = {
+            'datetime': '2012-03-04T05:06:07',
+            'date': '2012-03-04',
+            'time': '05:06:07',
+            'decimal': '1.50',
+            'uuid': '12345678-1234-5678-1234-567812345678',
+        }
+        self.assertEqual(json.loads(DjangboneJSONEncoder().encode(data)), expected)
+        backends = [JSONBackend()] + ([OrjsonBackend()] if OrjsonBackend.is_available() else [])
+        for backend in backends:
+            self.assertEqual(json.loads(backend.encode(data)), expected)
+            self.assertEqual(backend.decode(b'{"a": [1]}'), {'a': [1]})
+            self.assertRaises(ValueError, lambda: backend.decode(b'{"a": '))
+
+    def test_encoder_form_errors(self):
+        form = AddUserForm({ 'first_name': 'x' * 200 })
+        self.assertFalse(form.is_valid())
+        expected = { 'username': ['This field is required.'],
+                'first_name': ['Ensure this value has at most 150 characters (it has 200).'] }
+        backends = [JSONBackend()] + ([OrjsonBackend()] if OrjsonBackend.is_available() else [])
+        for backend in backends:
+            self.assertEqual(json.loads(backend.encode({ 'error': form.errors })), { 'error': expected })
+        if MsgpackBackend.is_available():
+            import msgpack
+            encoded = MsgpackBackend().encode({ 'error': form.errors, 'tuple': (1, 2) })
+            self.assertEqual(msgpack.unpackb(encoded, raw=False), { 'error': expected, 'tuple': [1, 2] })
+
+    @unittest.skipUnless(MsgpackBackend.is_available(), 'msgpack is not installed')
+    def test_msgpack_negotiation(self):
+        import msgpack
+        request = self.factory.get('/users/', HTTP_ACCEPT='application/x-msgpack')
+        response = ModelFullView.as_view()(request)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content, raw=False)[0]['username'], 'test1')
+        self.assertTrue('Accept' in response['Vary'])
+
+        # JSON stays the default, unless msgpack is ranked at least as high:
+        response = ModelFullView.as_view()(self.factory.get('/users/'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        for accept, content_type in (('application/json, application/msgpack;q=0', 'application/json'),
+                ('application/msgpack;q=0.5, application/json', 'application/json'),
+                ('application/msgpack;q=0.5, */*;q=0.1', 'application/msgpack'),
+                ('*/*', 'application/json')):
+            response = ModelFullView.as_view()(self.factory.get('/users/', HTTP_ACCEPT=accept))
+            self.assertEqual(response['Content-Type'], content_type)
+
+        # Request bodies are decoded according to their Content-Type:
+        request = self.request('post', '/users', msgpack.packb({'username': 'packed'}),
+                content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        response = ModelFullView.as_view()(request)
+        self.assertEqual(msgpack.unpackb(response.content, raw=False)['username'], 'packed')
+
+
+class QueryCountTest(ViewTestMixin, TestCase):
+    """
+    Ensure each single-object request fetches its instance at most once.
+    """
+    def setUp(self):
+        super(QueryCountTest, self).setUp()
+        self.view = ModelFullView.as_view()
+
+    def test_get_query_count(self):
+        request = self.request('get', '/users/%s' % self.user1.id)
+        with self.assertNumQueries(1):
+            response = self.view(request, id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'test1')
+
+    def test_post_query_count(self):
+        request = self.request('post', '/users', '{"username": "post_test"}')
+        # Uniqueness check for username, then the INSERT:
+        with self.assertNumQueries(2):
+            response = self.view(request)
+        self.assertEqual(json.loads(response.content)['id'], User.objects.get(username='post_test').id)
+
+    def test_put_query_count(self):
+        request = self.request('put', '/users/%s' % self.user1.id, '{"username": "put_test"}')
+        # Fetch the instance, check username uniqueness, then the UPDATE:
+        with self.assertNumQueries(3):
+            response = self.view(request, id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'put_test')
+
+    def test_custom_serialize_item_query_count(self):
+        User.objects.create(username='test2', first_name='Test', last_name='Two')
+        request = self.request('get', '/users/')
+        # Overriding serialize_item() turns off only(), which would otherwise defer
+        # first_name and last_name and load them with a query per row:
+        with self.assertNumQueries(1):
+            response = CustomItemView.as_view()(request)
+        self.assertEqual([item['name'] for item in json.loads(response.content)], ['Test One', 'Test Two'])
+
+    def test_custom_serialize_qs(self):
+        # Single items go through an overridden serialize_qs(), like collections:
+        view = DecoratedView.as_view()
+        self.assertTrue(json.loads(view(self.request('get', '/users/')).content)[0]['decorated'])
+        response = view(self.request('get', '/users/%s' % self.user1.id), id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['decorated'], True)
+        response = view(self.request('put', '/users/%s' % self.user1.id, '{"username": "put_test"}'), id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'put_test')
+        self.assertEqual(json.loads(response.content)['decorated'], True)
+
+    def test_delete_query_count(self):
+        request = self.request('delete', '/users/%s' % self.user1.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.view(request, id=str(self.user1.id))
+        self.assertEqual(response.status_code, 200)
+        # Related rows are cleaned up by the deletion collector, but the user
+        # itself is only read once:
+        user_selects = [q for q in queries.captured_queries
+                if q['sql'].startswith('SELECT') and 'FROM "auth_user" ' in q['sql']]
+        self.assertEqual(len(user_selects), 1)
+        self.assertFalse(User.objects.filter(id=self.user1.id).exists())
+
+
+class BulkTest(ViewTestMixin, TestCase):
+    """
+    Tests for bulk POST, PUT and DELETE requests on the collection url.
+    """
+    def setUp(self):
+        super(BulkTest, self).setUp()
+        self.view = BulkView.as_view()
+
+    def test_bulk_create(self):
+        response = self.view(self.request('post', '/users', [{'username': 'bulk1'}, {'username': 'bulk2'}]))
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.content)
+        self.assertEqual([u['username'] for u in response_data], ['bulk1', 'bulk2'])
+        self.assertEqual(User.objects.filter(username__startswith='bulk').count(), 2)
+
+        # If any item is invalid, nothing is saved and per-item errors are returned:
+        response = self.view(self.request('post', '/users', [{'username': 'bulk3'}, {'username': 'bulk1'}]))
+        self.assertEqual(response.status_code, 400)
+        errors = json.loads(response.content)['error']
+        self.assertEqual(errors[0], None)
+        self.assertEqual(errors[1]['errors'], { 'username': ['A user with that username already exists.'] })
+        self.assertFalse(User.objects.filter(username='bulk3').exists())
+
+        # Bulk requests are rejected unless the view enables them:
+        request = self.request('post', '/users', [{'username': 'bulk3'}])
+        self.assertEqual(ModelFullView.as_view()(request).status_code, 501)
+
+    def test_bulk_update(self):
+        user2 = User.objects.create(username='test2')
+        body = [{'id': self.user1.id, 'username': 'put1'}, {'id': user2.id, 'username': 'put2'}]
+        with self.assertNumQueries(6):     # in_bulk, 2 uniqueness checks, and one UPDATE in a transaction
+            response = self.view(self.request('put', '/users', body))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['put1', 'put2'])
+        self.assertEqual(User.objects.get(id=user2.id).username, 'put2')
+
+        # Unknown ids are reported as 404s:
+        response = self.view(self.request('put', '/users', [{'id': 999, 'username': 'put3'}]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['error'], [{'status': 404}])
+
+    def test_bulk_delete(self):
+        user2 = User.objects.create(username='test2')
+        response = self.view(self.request('delete', '/users', [self.user1.id, {'id': 999}]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(User.objects.count(), 2)
+
+        response = self.view(self.request('delete', '/users', [self.user1.id, {'id': user2.id}]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in json.loads(response.content)], [200, 200])
+        self.assertEqual(User.objects.count(), 0)
+
+
+@override_settings(CACHES={'djangbone-tests': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CacheTest(ViewTestMixin, TestCase):
+    """
+    Tests for ModelAPIView's versioned response cache.
+    """
+    def setUp(self):
+        super(CacheTest, self).setUp()
+        self.view = CachedView.as_view()
+
+    def get(self, path, **kwargs):
+        return self.view(self.request('get', path), **kwargs)
+
+    def test_cached_reads(self):
+        stats = CachedView.get_cache_stats()
+        hits, misses = stats['hits'], stats['misses']
+        first_response = self.get('/users/')
+        with self.assertNumQueries(0):
+            response = self.get('/users/')
+        self.assertEqual(response.content, first_response.content)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual((stats['hits'], stats['misses']), (hits + 1, misses + 1))
+
+        # Other query strings and single items are cached separately:
+        self.get('/users/?p=2')
+        self.assertEqual(json.loads(self.get('/users/1', id=str(self.user1.id)).content)['username'], 'test1')
+        self.assertEqual(stats['misses'], misses + 3)
+
+    def test_cache_per_user(self):
+        # Views with permission hooks don't serve one user's cached responses to another:
+        view = OwnerCachedView.as_view()
+        request = self.request('get', '/users/1', user=self.user1)
+        self.assertEqual(view(request, id=str(self.user1.id)).status_code, 200)
+        request = self.request('get', '/users/1')
+        self.assertEqual(view(request, id=str(self.user1.id)).status_code, 404)
+
+    def test_writes_invalidate_cache(self):
+        self.get('/users/')
+        self.get('/users/1', id=str(self.user1.id))
+        self.view(self.request('put', '/users/1', '{"username": "put_test"}'), id=str(self.user1.id))
+
+        self.assertEqual(json.loads(self.get('/users/').content)[0]['username'], 'put_test')
+        self.assertEqual(json.loads(self.get('/users/1', id=str(self.user1.id)).content)['username'], 'put_test')
+
+
+class DeltaSyncTest(ViewTestMixin, TestCase):
+    """
+    Tests for ?since= delta syncs and deletion tombstones.
+    """
+    def setUp(self):
+        super(DeltaSyncTest, self).setUp()
+        self.view = SyncView.as_view()
+
+    def create_users(self):
+        past = timezone.now() - datetime.timedelta(days=1)
+        self.user1 = User.objects.create(username='test1', date_joined=past)
+        self.user2 = User.objects.create(username='test2', date_joined=past)
+
+    def test_delta_sync(self):
+        response = self.view(self.request('get', '/users/'))
+        self.assertEqual(len(json.loads(response.content)), 2)
+        sync_token = response['X-Sync-Token']
+
+        User.objects.filter(id=self.user1.id).update(username='changed', date_joined=timezone.now())
+        self.view(self.request('delete', '/users/2'), id=str(self.user2.id))
+
+        response = self.view(self.request('get', '/users/', {'since': sync_token}))
+        response_data = json.loads(response.content)
+        self.assertEqual([u['username'] for u in response_data['changed']], ['changed'])
+        self.assertEqual(response_data['deleted'], [str(self.user2.id)])
+
+        # Nothing has changed since the new token:
+        response = self.view(self.request('get', '/users/', {'since': response_data['sync_token']}))
+        response_data = json.loads(response.content)
+        self.assertEqual((response_data['changed'], response_data['deleted']), ([], []))
+
+    def test_sync_overlap(self):
+        # A deletion timestamped just before the token (eg. committed after it was
+        # issued) is still found by the next sync:
+        view = type('OverlappingSyncView', (SyncView,), { 'sync_overlap': 5 }).as_view()
+        sync_token = view(self.request('get', '/users/'))['X-Sync-Token']
+        self.view(self.request('delete', '/users/2'), id=str(self.user2.id))
+        Tombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(seconds=2))
+        response = view(self.request('get', '/users/', {'since': sync_token}))
+        self.assertEqual(json.loads(response.content)['deleted'], [str(self.user2.id)])
+
+    def test_invalid_sync_token(self):
+        response = self.view(self.request('get', '/users/', {'since': 'garbage'}))
+        self.assertEqual(json.loads(response.content), {'reset': True})
+
+
+class RowPermissionTest(ViewTestMixin, TestCase):
+    """
+    Tests for queryset-level permissions with filter_queryset_for_user().
+    """
+    def setUp(self):
+        super(RowPermissionTest, self).setUp()
+        self.view = RowPermissionView.as_view()
+
+    def create_users(self):
+        super(RowPermissionTest, self).create_users()
+        self.user2 = User.objects.create(username='test2', first_name='Test', last_name='Two')
+
+    def test_filtered_reads(self):
+        with self.assertNumQueries(1):
+            response = self.view(self.request('get', '/users/'))
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['test1'])
+        response = self.view(self.request('get', '/users/2'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 404)
+
+        # An empty collection is returned as an empty list:
+        User.objects.filter(id=self.user1.id).update(last_name='Two')
+        response = self.view(self.request('get', '/users/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_object_perms(self):
+        view = ObjectPermissionView.as_view()
+        response = view(self.request('get', '/users/'))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(User.objects.filter(id=1).count(), 0)
+        self.assertEqual(len(json.loads(response.content)), 2)
+        self.assertEqual(view(self.request('get', '/users/?denied=1')).status_code, 404)
+        response = view(self.request('get', '/users/2'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_perms(self):
+        # Conditional GETs that would get a 304 are still refused when denied:
+        view = DeniedConditionalView.as_view()
+        future = http_date(time.time() + 3600)
+        response = view(self.request('get', '/users/1', HTTP_IF_MODIFIED_SINCE=future), id=str(self.user1.id))
+        self.assertEqual(response.status_code, 304)
+        response = view(self.request('get', '/users/2', HTTP_IF_MODIFIED_SINCE=future), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(view(self.request('get', '/users/', HTTP_IF_NONE_MATCH='*')).status_code, 304)
+        response = view(self.request('get', '/users/?denied=1', HTTP_IF_NONE_MATCH='*'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_legacy_collection_perms(self):
+        response = LegacyPermissionView.as_view()(self.request('get', '/users/'))
+        self.assertEqual(response.status_code, 404)
+        response = LegacyPermissionView.as_view()(self.request('get', '/users/1'), id=str(self.user1.id))
+        self.assertEqual(response.status_code, 200)
+
+    def test_filtered_writes(self):
+        response = self.view(self.request('put', '/users/2', '{"username": "put_test"}'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 404)
+        response = self.view(self.request('delete', '/users/2'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(User.objects.get(id=self.user2.id).username, 'test2')
+
+
+class FilterTest(ViewTestMixin, TestCase):
+    """
+    Tests for collection filters, ordering and sparse fieldsets.
+    """
+    def setUp(self):
+        super(FilterTest, self).setUp()
+        self.view = FilteredView.as_view()
+
+    def create_users(self):
+        User.objects.create(username='b', first_name='Test', last_name='One')
+        User.objects.create(username='a', first_name='Test', last_name='Two')
+        User.objects.create(username='c', first_name='Test', last_name='Two')
+
+    def get(self, query):
+        return self.view(self.request('get', '/users/', query))
+
+    def test_filters_and_ordering(self):
+        with self.assertNumQueries(1):
+            response = self.get({'last_name': 'Two', 'order': '-username'})
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['c', 'a'])
+        response = self.get({'username__in': 'a,b', 'order': 'username'})
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['a', 'b'])
+
+        # Parameters that aren't whitelisted are ignored:
+        response = self.get({'first_name': 'Nobody'})
+        self.assertEqual(len(json.loads(response.content)), 3)
+
+        # Invalid values and orderings are rejected:
+        self.assertEqual(self.get({'id__gte': 'abc'}).status_code, 400)
+        self.assertEqual(self.get({'order': 'password'}).status_code, 400)
+
+    def test_cursor_ordering(self):
+        request = self.factory.get('/users/', {'order': '-username'})
+        response = CursorFilteredView.as_view()(request)
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['c', 'b'])
+
+        # Nullable fields can't be used for cursors:
+        request = self.factory.get('/users/', {'order': 'last_login'})
+        response = CursorFilteredView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fields(self):
+        response = self.get({'fields': 'username', 'order': 'username'})
+        self.assertEqual(sorted(json.loads(response.content)[0].keys()), ['id', 'username'])
+        self.assertEqual(self.get({'fields': 'username,password'}).status_code, 400)
+
+
+class ListHandler(logging.Handler):
+    """
+    Logging handler that keeps the messages it's given.
+    """
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+class AuditTest(ViewTestMixin, TestCase):
+    """
+    Tests for the audit logging of writes.
+    """
+    def setUp(self):
+        super(AuditTest, self).setUp()
+        self.view = ModelFullView.as_view()
+        self.logger = logging.getLogger(AUDIT_LOGGER_NAME)
+        self.old_state = (self.logger.handlers[:], self.logger.level, self.logger.propagate)
+        self.handler = ListHandler()
+        self.logger.handlers = [self.handler]
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.handlers, level, self.logger.propagate = self.old_state
+        self.logger.setLevel(level)
+
+    def put(self, body):
+        return self.view(self.request('put', '/users/1', body), id=str(self.user1.id))
+
+    def test_audit_messages(self):
+        self.logger.setLevel(logging.INFO)
+        self.put('{"username": "test1", "first_name": "Changed", "last_name": "One"}')
+        self.assertEqual(self.handler.messages,
+                ["User:UPDATE:SUCCESS:: id=%s, updated_data={'first_name': ('Test', 'Changed')}, files=None" % self.user1.id])
+
+        # Records are skipped entirely when the level is disabled:
+        self.logger.setLevel(logging.WARNING)
+        self.put('{"username": "test1", "first_name": "Again", "last_name": "One"}')
+        self.assertEqual(len(self.handler.messages), 1)
+
+    def test_audit_queue(self):
+        self.logger.setLevel(logging.INFO)
+        listener = start_audit_queue()
+        self.put('{"username": "test1", "first_name": "Queued", "last_name": "One"}')
+        listener.stop()
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertTrue(self.handler.messages[0].startswith('User:UPDATE:SUCCESS:'))
+
+
+class InstrumentationTest(ViewTestMixin, TestCase):
+    """
+    Tests for per-request instrumentation.
+    """
+    def get(self, view):
+        return view.as_view()(self.request('get', '/users/'))
+
+    def test_metrics(self):
+        received = []
+        def receiver(sender, view, metrics, response, **kwargs):
+            received.append(metrics)
+        request_metrics.connect(receiver, sender=InstrumentedView)
+        try:
+            response = self.get(InstrumentedView)
+        finally:
+            request_metrics.disconnect(receiver, sender=InstrumentedView)
+        metrics = received[0]
+        self.assertEqual(metrics.queries, 1)
+        self.assertEqual(metrics.response_bytes, len(response.content))
+        self.assertEqual(set(metrics.timings), set(['total', 'read', 'serialize', 'encode']))
+        self.assertTrue('db;dur=' in response['Server-Timing'])
+        self.assertTrue('read;dur=' in response['Server-Timing'])
+
+        # Views without sinks don't collect anything:
+        self.assertFalse(self.get(ModelFullView).has_header('Server-Timing'))
+
+
+class BenchmarkTest(TestCase):
+    """
+    Check that the benchmark suite's scenarios all succeed.
+    """
+    def test_benchmark_suite(self):
+        User.objects.create(username='bystander')
+        results = benchmark_suite.run(rows=10, page_size=3, repeat=2, warmup=0)
+        self.assertEqual(len(results), 14)
+        for name, result in results.items():
+            self.assertTrue(result['status'] in (200, 204), name)
+        self.assertEqual(benchmark_suite.compare(results, results), [])
+
+        # Only the benchmarks' own rows are touched, and they're cleaned up:
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['bystander'])
+
+    def test_startup_benchmark(self):
+        results = dict(startup_benchmark.run(repeat=1, rows=3))
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(value > 0 for value in results.values()))
+
+
+class AsyncViewTest(ViewTestMixin, TestCase):
+    """
+    Tests for AsyncModelAPIView.
+    """
+    def create_users(self):
+        super(AsyncViewTest, self).create_users()
+        self.user2 = User.objects.create(username='test2', first_name='Test', last_name='Two')
+
+    async def test_async_reads(self):
+        view = AsyncView.as_view()
+        response = await view(self.request('get', '/users/'))
+        self.assertEqual([u['username'] for u in json.loads(response.content)], ['test1', 'test2'])
+        response = await view(self.request('get', '/users/1'), id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'test1')
+        response = await view(self.request('get', '/users/0'), id='0')
+        self.assertEqual(response.status_code, 404)
+
+    @unittest.skipUnless(apps.is_installed('django.contrib.sessions'), 'django.contrib.sessions is not installed')
+    async def test_async_read_your_writes(self):
+        # Database-backed sessions can't be loaded from the event loop:
+        from django.contrib.sessions.backends.db import SessionStore
+
+        def get_session():
+            session = SessionStore()
+            session.create()
+            return SessionStore(session.session_key)
+
+        view = type('ReadYourWritesAsyncView', (AsyncView,), { 'read_db_alias': 'default', 'read_your_writes': 60 })
+        request = self.request('put', '/users/1', '{"username": "changed", "first_name": "Test", "last_name": "One"}')
+        request.session = await sync_to_async(get_session)()
+        response = await view.as_view()(request, id=str(self.user1.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(view.last_write_key in request.session)
+
+        request = self.request('get', '/users/')
+        request.session = await sync_to_async(get_session)()
+        response = await view.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_legacy_collection_perms(self):
+        view = type('LegacyAsyncView', (AsyncView,), { 'user_has_perm': LegacyPermissionView.user_has_perm })
+        response = await view.as_view()(self.request('get', '/users/'))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_streaming(self):
+        response = await AsyncStreamingView.as_view()(self.request('get', '/users/'))
+        self.assertTrue(response.streaming)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([u['username'] for u in json.loads(content)], ['test1', 'test2'])
+
+    async def test_async_writes(self):
+        view = AsyncView.as_view()
+        body = '{"username": "test3", "first_name": "Test", "last_name": "Three"}'
+        response = await view(self.request('post', '/users/', body))
+        self.assertEqual(json.loads(response.content)['username'], 'test3')
+        body = '{"username": "changed", "first_name": "Test", "last_name": "One"}'
+        response = await view(self.request('put', '/users/1', body), id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'changed')
+        response = await view(self.request('delete', '/users/2'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 200)
+        usernames = [u.username async for u in User.objects.order_by('pk')]
+        self.assertEqual(usernames, ['changed', 'test3'])
+
+    async def test_async_locked_writes(self):
+        view = type('LockingAsyncView', (AsyncView,), { 'lock_for_update': True }).as_view()
+        body = '{"username": "changed", "first_name": "Test", "last_name": "One"}'
+        response = await view(self.request('put', '/users/1', body), id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'changed')
+        response = await view(self.request('delete', '/users/2'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 200)
+        response = await view(self.request('delete', '/users/2'), id=str(self.user2.id))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual([u.username async for u in User.objects.order_by('pk')], ['changed'])
+
+        # Views without a model just don't support DELETE:
+        response = await AsyncBackboneAPIView.as_view()(self.request('delete', '/users/1'), id='1')
+        self.assertEqual(response.status_code, 404)
+
+
+class BatchTest(ViewTestMixin, TransactionTestCase):
+    """
+    Tests for BatchView.
+    """
+    def setUp(self):
+        super(BatchTest, self).setUp()
+        self.view = UserBatchView.as_view()
+
+    def create_users(self):
+        super(BatchTest, self).create_users()
+        self.user2 = User.objects.create(username='test2', first_name='Test', last_name='Two')
+
+    def batch(self, body):
+        return self.view(self.request('post', '/batch/', body))
+
+    def test_batch(self):
+        response = self.batch([
+            { 'method': 'GET', 'view': 'users' },
+            { 'method': 'GET', 'view': 'async-users', 'id': self.user2.id },
+            { 'method': 'PUT', 'view': 'users', 'id': self.user1.id,
+              'body': { 'username': 'changed', 'first_name': 'Test', 'last_name': 'One' } },
+            { 'method': 'GET', 'view': 'users', 'id': self.user1.id },
+            { 'method': 'GET', 'view': 'users', 'id': 0 },
+            { 'method': 'GET', 'view': 'unknown' },
+        ])
+        results = json.loads(response.content)
+        self.assertEqual([r['status'] for r in results], [200, 200, 200, 200, 404, 404])
+        self.assertEqual(len(results[0]['body']), 2)
+        self.assertEqual(results[1]['body']['username'], 'test2')
+        self.assertEqual(results[3]['body']['username'], 'changed')
+
+    def test_shared_user_loaded_once(self):
+        threads = []
+        def get_user():
+            threads.append(threading.get_ident())
+            return AnonymousUser()
+        request = self.request('post', '/batch/', [{ 'view': 'users' }] * 4, user=SimpleLazyObject(get_user))
+        results = json.loads(self.view(request).content)
+        self.assertEqual([r['status'] for r in results], [200] * 4)
+        self.assertEqual(threads, [threading.get_ident()])
+
+    @override_settings(ROOT_URLCONF='djangbone.tests', LOGIN_URL='/login/')
+    def test_decorated_view(self):
+        results = json.loads(self.batch([{ 'view': 'private-users' }]).content)
+        self.assertEqual(results[0]['status'], 302)
+        self.assertTrue(results[0]['headers']['Location'].startswith('/login/'))
+        self.assertIsNone(results[0]['body'])
+
+    def test_invalid_batch(self):
+        self.assertEqual(self.batch({ 'method': 'GET' }).status_code, 400)
+        self.assertEqual(self.batch([{ 'method': 'GET' }] * 51).status_code, 400)
+
+
+class RoutingTest(ViewTestMixin, TestCase):
+    """
+    Tests for database routing and read-your-writes.
+    """
+    def get_view(self, request):
+        view = RoutedView()
+        view.request = request
+        return view
+
+    def test_db_aliases(self):
+        view = self.get_view(self.factory.get('/users/'))
+        self.assertEqual(view.get_db_alias('read_collection'), 'replica')
+        self.assertEqual(view.get_db_alias('update'), 'default')
+        self.assertTrue(view.get_queryset('update').query.select_for_update)
+        self.assertFalse(view.get_queryset('read_collection').query.select_for_update)
+
+    def test_read_your_writes(self):
+        request = self.request('put', '/users/1', '{"username": "changed", "first_name": "Test", "last_name": "One"}')
+        response = RoutedView.as_view()(request, id=str(self.user1.id))
+        self.assertEqual(response.status_code, 200)
+        cookie = response.cookies[RoutedView.last_write_key].value
+
+        request = self.factory.get('/users/')
+        request.COOKIES[RoutedView.last_write_key] = cookie
+        self.assertEqual(self.get_view(request).get_db_alias('read_collection'), 'default')
+        request.COOKIES[RoutedView.last_write_key] = str(float(cookie) - 120)
+        self.assertEqual(self.get_view(request).get_db_alias('read_collection'), 'replica')
+
+    @override_settings(DATABASE_ROUTERS=['djangbone.tests.WriteRouter'])
+    def test_write_db_follows_routers(self):
+        view = ModelFullView()
+        self.assertEqual(view.get_write_db(), 'replica')
+        self.assertEqual(self.get_view(self.factory.get('/users/')).get_write_db(), 'default')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TotalCountTest(ViewTestMixin, TestCase):
+    """
+    Tests for the total count header on paginated collections.
+    """
+    def create_users(self):
+        super(TotalCountTest, self).create_users()
+        User.objects.create(username='test2', first_name='Test', last_name='Two')
+
+    def call(self, view, method='get', body=None):
+        return view.as_view()(self.request(method, '/users/', body))
+
+    def test_exact_count(self):
+        with self.assertNumQueries(2):
+            response = self.call(CountView)
+        self.assertEqual(response['X-Total-Count'], '2')
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+        # Estimates fall back to exact counts on databases without them:
+        response = self.call(EstimatedCountView)
+        self.assertEqual(response['X-Total-Count'], '2')
+        self.assertFalse(response.has_header('X-Total-Count-Estimated'))
+
+    def test_cached_count(self):
+        self.assertEqual(self.call(CachedCountView)['X-Total-Count'], '2')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.call(CachedCountView)['X-Total-Count'], '2')
+        self.call(CachedCountView, 'post', '{"username": "test3", "first_name": "Test", "last_name": "Three"}')
+        self.assertEqual(self.call(CachedCountView)['X-Total-Count'], '3')
+
+
+class RequestParsingTest(ViewTestMixin, TestCase):
+    """
+    Tests for method overrides and request body limits.
+    """
+    def setUp(self):
+        super(RequestParsingTest, self).setUp()
+        self.view = ParsingView.as_view()
+
+    def test_method_override(self):
+        request = self.request('post', '/users/1', '{"username": "changed", "first_name": "Test", "last_name": "One"}',
+                HTTP_X_HTTP_METHOD_OVERRIDE='PUT')
+        response = self.view(request, id=str(self.user1.id))
+        self.assertEqual(json.loads(response.content)['username'], 'changed')
+        # JSON bodies never go through Django's form parser:
+        self.assertFalse(hasattr(request, '_post'))
+
+        request = self.request('post', '/users/1', { '_method': 'DELETE' }, content_type=MULTIPART_CONTENT)
+        self.assertEqual(self.view(request, id=str(self.user1.id)).status_code, 200)
+        self.assertFalse(User.objects.filter(id=self.user1.id).exists())
+
+    def test_body_limits(self):
+        request = self.request('post', '/users/', { 'username': 'x' * 500 })
+        with self.assertNumQueries(0):
+            response = self.view(request)
+        self.assertEqual(response.status_code, 413)
+
+        request = self.request('post', '/users/', '{"username": ')
+        self.assertEqual(self.view(request).status_code, 400)
+
+    def test_uploads_to_disk(self):
+        request = self.request('post', '/users/', { 'username': 'test2' }, content_type=MULTIPART_CONTENT)
+        self.view(request)
+        self.assertTrue(isinstance(request.upload_handlers[0], TemporaryFileUploadHandler))
+
+    def test_uploads_after_csrf_middleware(self):
+        # CsrfViewMiddleware reads request.POST before the view is called, after
+        # which the upload handlers can't be changed:
+        token = 'a' * 32
+        request = self.request('post', '/users/', { 'username': 'test2', 'csrfmiddlewaretoken': token },
+                content_type=MULTIPART_CONTENT)
+        request.COOKIES[settings.CSRF_COOKIE_NAME] = token
+        view = type('UploadView', (ParsingView,), { 'max_body_size': None }).as_view()
+        self.assertEqual(CsrfViewMiddleware(view).process_view(request, view, (), {}), None)
+        view(request)
+        self.assertTrue(User.objects.filter(username='test2').exists())
+
+
+class ValidationTest(ViewTestMixin, TestCase):
+    """
+    Tests for writes validated with validate_fields instead of forms.
+    """
+    def call(self, view, method, body, id=None):
+        return view.as_view()(self.request(method, '/users/', body), **({ 'id': str(id) } if id else {}))
+
+    def test_validated_create(self):
+        with self.assertNumQueries(2):
+            response = self.call(ValidatedView, 'post', '{"username": "test2", "first_name": "Test", "last_name": "Two"}')
+        self.assertEqual(json.loads(response.content)['username'], 'test2')
+        self.assertEqual(User.objects.get(username='test2').last_name, 'Two')
+
+        response = self.call(ValidatedView, 'post', '{"first_name": "Test"}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), { 'error': { 'username': ['This field is required.'] } })
+        response = self.call(ValidatedView, 'post', '{"username": "test1", "first_name": "A", "last_name": "B"}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content),
+                { 'error': { 'username': ['A user with that username already exists.'] } })
+
+    def test_validated_update(self):
+        # Unchanged values aren't written (or checked for uniqueness) again:
+        with self.assertNumQueries(1):
+            self.call(ValidatedView, 'put', '{"username": "test1", "first_name": "Test"}', self.user1.id)
+        with self.assertNumQueries(2):
+            response = self.call(ValidatedView, 'put', '{"username": "test1", "first_name": "Changed"}', self.user1.id)
+        self.assertEqual(json.loads(response.content)['first_name'], 'Changed')
+        self.assertEqual(User.objects.get(id=self.user1.id).first_name, 'Changed')
+
+
+class WriteResponseTest(ViewTestMixin, TestCase):
+    """
+    Tests for write_response and the Prefer header.
+    """
+    def call(self, view, method, body, id=None, **headers):
+        return view.as_view()(self.request(method, '/users/', body, **headers), **({ 'id': str(id) } if id else {}))
+
+    def test_minimal_response(self):
+        response = self.call(ModelFullView, 'put', '{"username": "test1", "first_name": "Changed", "last_name": "One"}',
+                self.user1.id, HTTP_PREFER='return=minimal')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Preference-Applied'], 'return=minimal')
+        self.assertEqual(User.objects.get(id=self.user1.id).first_name, 'Changed')
+
+        response = self.call(ModelFullView, 'post', '{"username": "test2", "first_name": "A", "last_name": "B"}',
+                HTTP_PREFER='return=minimal')
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(User.objects.filter(username='test2').exists())
+
+    def test_changed_response(self):
+        response = self.call(ChangedResponseView, 'put', '{"username": "test1", "first_name": "Changed", "last_name": "One"}',
+                self.user1.id)
+        self.assertEqual(json.loads(response.content), { 'id': self.user1.id, 'first_name': 'Changed' })
+
+        # Creates, and clients that ask for the full representation, get the whole object:
+        response = self.call(ChangedResponseView, 'put', '{"username": "test1", "first_name": "Changed", "last_name": "One"}',
+                self.user1.id, HTTP_PREFER='return=representation')
+        self.assertEqual(json.loads(response.content)['last_name'], 'One')
+        response = self.call(ChangedResponseView, 'post', '{"username": "test2", "first_name": "A", "last_name": "B"}')
+        self.assertEqual(json.loads(response.content)['username'], 'test2')
+
+
+class CompressionTest(ViewTestMixin, TestCase):
+    """
+    Tests for compressing responses with compress_min_size.
+    """
+    def create_users(self):
+        for i in range(10):
+            User.objects.create(username='test%s' % i, first_name='Test', last_name='User %s' % i)
+
+    def get(self, **headers):
+        return CompressedView.as_view()(self.request('get', '/users/', **headers))
+
+    def test_compressed_stream(self):
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        data = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(len(data), 10)
+
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 10)
+
+    def test_compression_threshold(self):
+        request = self.request('post', '/users/', '{"username": "new", "first_name": "A", "last_name": "B"}',
+                HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressedView.as_view()(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content)['username'], 'new')
+
+
+class EventTest(ViewTestMixin, TestCase):
+    """
+    Tests for change events and the event stream view.
+    """
+    def setUp(self):
+        super(EventTest, self).setUp()
+        self.broker = EventView.event_broker = InMemoryBroker(history=2)
+        self.channel = EventView().get_event_channel()
+
+    def put(self, first_name):
+        request = self.request('put', '/users/', { 'username': 'test1', 'first_name': first_name, 'last_name': 'One' })
+        return EventView.as_view()(request, id=str(self.user1.id))
+
+    def stream(self, **headers):
+        request = self.request('get', '/users/events', **headers)
+        response = UserEventStreamView.as_view()(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return iter(response.streaming_content)
+
+    def test_change_events(self):
+        # Events are only published once the write is committed:
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.put('Changed')
+        self.assertEqual(self.broker.last_event_id(self.channel), None)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.broker.get_events(self.channel, None, timeout=0),
+                [('1', { 'action': 'update', 'ids': [self.user1.id] })])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EventView.as_view()(self.request('delete', '/users/'), id=str(self.user1.id))
+        self.assertEqual(self.broker.get_events(self.channel, '1', timeout=0),
+                [('2', { 'action': 'delete', 'ids': [self.user1.id] })])
+
+    def test_event_stream(self):
+        stream = self.stream()
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        self.assertEqual(next(stream), b': keep-alive\n\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.put('Changed')
+        self.assertEqual(next(stream), ('id: 1\ndata: {"action": "update", "ids": [%s]}\n\n' % self.user1.id).encode())
+
+        # Reconnecting clients get the events they missed, or a reset if they're gone:
+        for name in ('A', 'B'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.put(name)
+        stream = self.stream(HTTP_LAST_EVENT_ID='2')
+        next(stream)
+        self.assertEqual(next(stream).count(b'id: 3'), 1)
+        stream = self.stream(HTTP_LAST_EVENT_ID='0')
+        next(stream)
+        self.assertEqual(next(stream), b'event: reset\nid: 3\ndata: {}\n\n')
+
+    @override_settings(ROOT_URLCONF='djangbone.tests', LOGIN_URL='/login/')
+    def test_event_stream_permissions(self):
+        request = self.request('get', '/users/events')
+        self.assertEqual(PrivateEventStreamView.as_view()(request).status_code, 302)
+
+        # Clients are only sent the ids they can read, or just the event's id if none:
+        other = User.objects.create(username='test2')
+        request = self.request('get', '/users/events', user=self.user1)
+        stream = iter(PrivateEventStreamView.as_view()(request).streaming_content)
+        next(stream)
+        self.broker.publish(self.channel, { 'action': 'update', 'ids': [other.id] })
+        self.broker.publish(self.channel, { 'action': 'update', 'ids': [other.id, self.user1.id] })
+        self.assertEqual(next(stream),
+                ('id: 1\n\nid: 2\ndata: {"action": "update", "ids": [%s]}\n\n' % self.user1.id).encode())
+        self.broker.publish(self.channel, { 'action': 'delete', 'ids': [other.id] })
+        self.assertEqual(next(stream), b'id: 3\n\n')
+
+        # Views whose changes aren't published can't be streamed:
+        view = type('NoBrokerStreamView', (EventStreamView,), { 'view_class': ModelFullView }).as_view()
+        self.assertRaises(ImproperlyConfigured, view, request)
+
+    def test_async_event_stream(self):
+        # Async view classes are dispatched to as well:
+        view_class = type('AsyncEventView', (AsyncView,), { 'event_broker': self.broker })
+        request = self.request('get', '/users/events')
+        view = type('AsyncEventStreamView', (UserEventStreamView,), { 'view_class': view_class }).as_view()
+        stream = iter(view(request).streaming_content)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
 
-        # Should raise 404 if we try to access a deleted resource again:
-        request = self.factory.delete('/users/1')
-        self.assertRaises(Http404, lambda: self.view(request, id='1'))
+    async def test_asgi_event_stream(self):
+        request = AsyncRequestFactory().get('/users/events')
+        request.user = AnonymousUser()
+        response = await sync_to_async(UserEventStreamView.as_view())(request)
+        self.assertTrue(response.is_async)
+        stream = response.streaming_content
+        self.assertEqual(await stream.__anext__(), b'retry: 3000\n\n')
+        self.assertEqual(await stream.__anext__(), b': keep-alive\n\n')
+        self.broker.publish(self.channel, { 'action': 'update', 'ids': [self.user1.id] })
+        self.assertEqual(await stream.__anext__(),
+                ('id: 1\ndata: {"action": "update", "ids": [%s]}\n\n' % self.user1.id).encode())
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class TombstonesConfig(AppConfig):
+    """
+    The optional app that records deletions for ModelAPIView's delta syncs.
+    Only projects that use delta_sync need it in INSTALLED_APPS.
+    """
+    name = 'djangbone.tombstones'
+    label = 'djangbone_tombstones'
+    verbose_name = 'Djangbone tombstones'
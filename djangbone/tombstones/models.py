@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class TombstoneManager(models.Manager):
+
+    def prune(self, before):
+        """
+        Delete the tombstones recorded before the given datetime. Clients that
+        last synced before then will have to fetch their collections again.
+        """
+        return self.filter(deleted_at__lt=before).delete()
+
+
+class Tombstone(models.Model):
+    """
+    Lightweight record of a deleted object, so that clients doing a delta sync
+    (see ModelAPIView.delta_sync) can find out about deletions.
+    """
+    id = models.BigAutoField(primary_key=True)
+    model_label = models.CharField(max_length=100)      # eg. 'myapp.Widget'
+    object_id = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['model_label', 'deleted_at'])]
+
+    def __str__(self):
+        return '%s %s deleted at %s' % (self.model_label, self.object_id, self.deleted_at)
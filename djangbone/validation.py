@@ -0,0 +1,77 @@
+from django import forms
+from django.core.exceptions import ValidationError
+
+
+REQUIRED_MESSAGE = forms.Field.default_error_messages['required']
+
+
+class ModelValidator(object):
+    """
+    Validates and converts decoded request data (a dict) for a set of model
+    fields, without building a ModelForm. The model fields are looked up once,
+    when the validator is built, so validating a request only runs each field's
+    to_python(), validators and uniqueness checks.
+
+    Errors are returned in the same shape as ModelForm.errors, ie. a dict of
+    {field name: [messages]}, with '__all__' for errors that span fields.
+    """
+    def __init__(self, model, fields='__all__'):
+        self.model = model
+        meta = model._meta
+        if fields == '__all__':
+            fields = [f.name for f in meta.concrete_fields if f.editable and not f.primary_key]
+        self.fields = []        # (name, attname, field) for each validated field
+        for name in fields:
+            field = meta.get_field(name)
+            if not field.concrete or field.many_to_many or field.primary_key:
+                raise ValueError('%s.%s cannot be validated without a form' % (model.__name__, name))
+            self.fields.append((field.name, field.attname, field))
+        names = set(name for name, attname, field in self.fields)
+        self.unique_exclude = [f.name for f in meta.fields if f.name not in names]
+        self.auto_now_fields = [f.name for f in meta.concrete_fields if getattr(f, 'auto_now', False)]
+
+    def validate(self, data, instance):
+        """
+        Validate data for the instance (which is new for creates), setting the
+        cleaned values on it. Returns a (changed, errors) tuple, where changed
+        lists the names of the fields whose values changed.
+
+        Only the fields present in data are validated, except that for new
+        instances every field is required unless it's blank=True or has a default.
+        """
+        cleaned, errors = {}, {}
+        creating = instance._state.adding
+        for name, attname, field in self.fields:
+            if name in data:
+                value = data[name]
+            elif attname in data:
+                value = data[attname]
+            else:
+                if creating and not field.blank and not field.has_default():
+                    errors[name] = [REQUIRED_MESSAGE]
+                continue
+            if value in field.empty_values:
+                if not field.blank:
+                    errors[name] = [REQUIRED_MESSAGE]
+                else:
+                    cleaned[name] = '' if field.empty_strings_allowed and not (value is None and field.null) else None
+                continue
+            try:
+                cleaned[name] = field.clean(value, instance)
+            except ValidationError as e:
+                errors[name] = e.messages
+        if errors:
+            return [], errors
+
+        changed = []
+        for name, attname, field in self.fields:
+            if name in cleaned and (creating or getattr(instance, attname) != cleaned[name]):
+                setattr(instance, attname, cleaned[name])
+                changed.append(name)
+        try:
+            # Unchanged values don't need their uniqueness checked again:
+            instance.validate_unique(exclude=self.unique_exclude + [name for name, attname, field in self.fields
+                    if name not in changed])
+        except ValidationError as e:
+            return [], e.message_dict
+        return changed, {}
@@ -1,26 +1,171 @@
+import calendar
 import datetime
+import hashlib
 import json
+import time
+from itertools import chain
 
-from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponse, Http404
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import (EmptyResultSet, FieldDoesNotExist, MultipleObjectsReturned,
+        ObjectDoesNotExist, ValidationError)
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.query import QuerySet
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import HttpResponse, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
 from django.views.generic import View
-from django.forms.models import model_to_dict
-from utils.logging import logging_dict, get_data_diff
+from djangbone.audit import AUDIT_LOGGER_NAME, AuditRecord
+from djangbone.compression import BrotliCompressor, GzipCompressor, get_quality
+from djangbone.encoders import DjangboneJSONEncoder, JSONBackend, MsgpackBackend, OrjsonBackend, parse_qualities
+from djangbone.instrumentation import NULL_METRICS, RequestMetrics
 
 import logging
-logger = logging.getLogger('pivot.api')
+logger = logging.getLogger(AUDIT_LOGGER_NAME)
 
-class DjangboneJSONEncoder(json.JSONEncoder):
+def get_instance_diff(instance, data):
     """
-    JSON encoder that converts additional Python types to JSON.
+    Return a dict of {field name: (old value, new value)} for the model fields in
+    data whose values differ from the instance's. Call this before a form has
+    been validated, since validation copies the new values onto the instance.
+    """
+    diff = {}
+    for name, value in data.items():
+        try:
+            field = instance._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many:
+            old_value = getattr(instance, field.attname)
+            if old_value != value:
+                diff[name] = (old_value, value)
+    return diff
+
+class InvalidRequest(Exception):
+    """
+    Raised by view methods when the request is invalid (eg. it has bad GET
+    parameters), to make BackboneAPIView.dispatch() respond with an error.
+    """
+    def __init__(self, message='', status=400):
+        super(InvalidRequest, self).__init__(message)
+        self.status = status
+
+class CursorSerializer(object):
+    """
+    Serializer for django.core.signing that can handle the datetimes (and other
+    types supported by DjangboneJSONEncoder) that end up in pagination cursors.
+    """
+    def dumps(self, obj):
+        return DjangboneJSONEncoder(separators=(',', ':')).encode(obj).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+class SerializationPlan(object):
+    """
+    The fields that CustomModelAPIView.serialize_item() outputs for a model,
+    worked out once instead of on every row.
+
+    Matches the output of django.forms.models.model_to_dict() (restricted to
+    serialize_fields), except that many-to-many fields are serialized as lists
+    of primary keys.
+    """
+    def __init__(self, model, fields=None):
+        opts = model._meta
+        self.fields = []        # (output key, attribute name) pairs for concrete fields
+        self.m2m_fields = []    # Names of many-to-many fields
+        for f in chain(opts.concrete_fields, opts.many_to_many):
+            if not getattr(f, 'editable', False):
+                continue
+            if fields and f.name not in fields:
+                continue
+            if f.many_to_many:
+                self.m2m_fields.append(f.name)
+            else:
+                self.fields.append((f.name, f.attname))
+        self.only_fields = [opts.pk.name] + [name for name, attname in self.fields if name != opts.pk.name]
+
+    def prepare_queryset(self, queryset, extra_fields=()):
+        """
+        Limit the queryset to the serialized columns (plus any extra_fields), and
+        fetch many-to-many values with one query per field instead of per row.
+        """
+        queryset = queryset.only(*(self.only_fields + list(extra_fields)))
+        if self.m2m_fields:
+            queryset = queryset.prefetch_related(*self.m2m_fields)
+        return queryset
+
+    def serialize(self, item):
+        item_dict = dict((name, getattr(item, attname)) for name, attname in self.fields)
+        for name in self.m2m_fields:
+            item_dict[name] = [related.pk for related in getattr(item, name).all()]
+        return item_dict
 
-    Currently only datetime.datetime instances are supported.
+class ViewMetadata(object):
     """
-    def default(self, obj):
+    What ModelAPIView needs to know about its model and serialize_fields on
+    every request, worked out once per view class instead of on each request
+    (see ModelAPIView.get_metadata()).
+    """
+    def __init__(self, view_class, model, fields=None):
+        meta = model._meta
+        self.model = model
+        self.fields = fields
+        self.label = meta.label
+        self.pk_name = meta.pk.name
+        self.pk_attname = meta.pk.attname
+        self.field_names = frozenset(f.name for f in meta.get_fields())
+        self.auto_now_fields = [f for f in meta.concrete_fields if getattr(f, 'auto_now', False)]
+        self.bulk_update_fields = frozenset(f.name for f in meta.concrete_fields if not f.primary_key)
+        self.instance_fields = []   # (output key, field) pairs for the serialized fields that are local columns
+        self.lookup_fields = []     # Serialized fields that aren't (eg. lookups through relationships)
+        if not fields:
+            self.instance_fields = [(f.attname, f) for f in meta.concrete_fields]
+        for name in fields or ():
+            try:
+                field = meta.pk if name == 'pk' else meta.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.many_to_many:
+                self.lookup_fields.append(name)
+            else:
+                self.instance_fields.append((name, field))
+        # Whether user_has_perm() needs calling for every object of a bulk request:
+        self.checks_object_perms = view_class.user_has_perm is not ModelAPIView.user_has_perm
+        self.checks_collection_perms = (view_class.user_has_collection_perm is not
+                ModelAPIView.user_has_collection_perm)
+        self.filters_for_user = view_class.filter_queryset_for_user is not ModelAPIView.filter_queryset_for_user
+        # Whether serialize_qs() is customized, so single instances have to go through it too:
+        self.custom_serialize_qs = view_class.serialize_qs not in (ModelAPIView.serialize_qs,
+                CustomModelAPIView.serialize_qs)
+
+    _serialization_plan = None
+
+    @property
+    def serialization_plan(self):
         """
-        Convert datetime objects to ISO-compatible strings during json serialization.
+        The SerializationPlan that CustomModelAPIView serializes instances with,
+        which is only built if it's needed.
         """
-        return obj.isoformat() if isinstance(obj, datetime.datetime) else str(obj)
+        if self._serialization_plan is None:
+            self._serialization_plan = SerializationPlan(self.model, self.fields)
+        return self._serialization_plan
+
+class StreamedCollection(object):
+    """
+    Wrapper around an iterable of serialized items, which tells
+    BackboneAPIView.success_response() to stream them to the client as a JSON
+    array instead of encoding the whole collection in one go.
+    """
+    def __init__(self, items):
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items)
 
 class BackboneAPIView(View):
     """
@@ -33,33 +178,125 @@ class BackboneAPIView(View):
         delete -> DELETE /collection/id
     """
     request_type = "json"
+    request_data = None         # The (data, files) parsed from the request body, once get_request_data() is called
 
     # Override these if you have custom JSON encoding/decoding needs:
     json_encoder = DjangboneJSONEncoder()
     json_decoder = json.JSONDecoder()
 
+    # Use orjson for JSON when it's installed (and json_encoder/json_decoder aren't overridden):
+    fast_json = True
+
+    # EncoderBackend classes for other formats that clients can ask for in the Accept header
+    # (or send, with a matching Content-Type). Each is only used if its library is installed:
+    extra_formats = (MsgpackBackend,)
+
+    # Number of items fetched and encoded per chunk when streaming a collection:
+    stream_chunk_size = 2000
+
+    # Set to True to answer GETs with 304 Not Modified when the client's copy is current:
+    conditional_get = False
+
+    # MetricsSink instances (see djangbone.instrumentation) to send per-request timings,
+    # query counts and response sizes to, eg. (ServerTimingSink(),). Empty to disable:
+    instrumentation_sinks = ()
+    metrics = NULL_METRICS      # The current request's RequestMetrics, when instrumented
+
+    # Request body settings:
+    max_body_size = None        # Maximum request body size in bytes; larger requests get a 413 response
+    stream_uploads_to_disk = False  # Set to True to write all multipart uploads to temporary files
+
+    # What a successful (single item) POST or PUT responds with: 'full' (the saved object),
+    # 'changed' (its id and the fields that the request changed) or 'minimal' (204 No Content).
+    # Clients can ask for 'minimal' or 'full' with a Prefer: return=minimal/representation header:
+    write_response = 'full'
+
+    # Optional response compression settings:
+    compress_min_size = None    # Compress bodies of at least this many bytes (and all streamed ones); None to disable
+    compressors = (BrotliCompressor, GzipCompressor)    # Codings to use, in order of preference, if installed
+
     def dispatch(self, request, *args, **kwargs):
         """
-        Allow emulating all http methods over POST with an _method field
-        to specify the actual method.
+        Allow emulating all http methods over POST with an X-HTTP-Method-Override
+        header, or with an _method field in form data,
         i.e. _method = 'PUT' will call the put method.
 
-        This can also be done with including a custom header on the request.
-        However, this fails with something like jquery form plugin which uses
-        a hidden iframe to upload files.
+        The header is checked first. The _method field is only looked for in
+        form-encoded bodies (which need parsing anyway), because the header
+        fails with something like jquery form plugin which uses a hidden iframe
+        to upload files.
+        """
+        handler = self.start_request(request, args, kwargs)
+        with self.metrics.collect():
+            try:
+                response = handler(request, *args, **kwargs)
+            except InvalidRequest as e:
+                response = self.error_response(str(e), status=e.status)
+        return self.finish_request(response)
 
+    def start_request(self, request, args, kwargs):
+        """
+        Set up the per-request state, and return the handler for the request's
+        (possibly emulated) method.
         """
+        self.request_type = self.get_request_type(request)
         request_method = request.method.lower()
-        if request_method == 'post':
-            request_method = request.POST.get('_method', 'post').lower()
-        if request_method in self.http_method_names:
-            handler = getattr(self, "_" + request_method, self.http_method_not_allowed)
+        if self.max_body_size is not None and self.get_content_length(request) > self.max_body_size:
+            handler = self.request_too_large
         else:
-            handler = self.http_method_not_allowed
+            # Middleware (eg. CsrfViewMiddleware) may already have parsed the upload:
+            if self.request_type == "form-multipart" and self.stream_uploads_to_disk and not hasattr(request, '_files'):
+                request.upload_handlers = [TemporaryFileUploadHandler(request)]
+            if request_method == 'post':
+                override = request.META.get('HTTP_X_HTTP_METHOD_OVERRIDE')
+                if override:
+                    request_method = override.lower()
+                elif self.request_type != "json":
+                    request_method = request.POST.get('_method', 'post').lower()
+            if request_method in self.http_method_names:
+                handler = getattr(self, "_" + request_method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
         self.request = request
         self.args = args
         self.kwargs = kwargs
-        return handler(request, *args, **kwargs)
+        self.response_headers = {}      # Extra headers to send with a successful response
+        self.request_data = None
+        self.metrics = RequestMetrics() if self.instrumentation_sinks else NULL_METRICS
+        return handler
+
+    def get_request_type(self, request):
+        """
+        Return how the request body is encoded: "form", "form-multipart" or
+        "json" (which also covers the other formats in extra_formats).
+        """
+        format = request.META.get('CONTENT_TYPE', 'application/json')
+        if format.find("application/x-www-form-urlencoded") != -1:
+            return "form"
+        elif format.find("multipart/form-data") != -1:
+            return "form-multipart"
+        return "json"
+
+    def get_content_length(self, request):
+        try:
+            return int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return 0
+
+    def request_too_large(self, request, *args, **kwargs):
+        return self.error_response('Request body too large', status=413)
+
+    def finish_request(self, response):
+        """
+        Compress the response if it's worth it, and send the request's metrics
+        to the instrumentation sinks, if there are any.
+        """
+        response = self.compress_response(response)
+        if self.metrics.enabled:
+            self.metrics.finish(response)
+            for sink in self.instrumentation_sinks:
+                sink.emit(self, self.metrics, response)
+        return response
 
     def create(self, data={}, files={}):
         """
@@ -107,85 +344,354 @@ class BackboneAPIView(View):
         """
         return False
 
+    def bulk_create(self, items):
+        """
+        Items will be a list of dicts, one per object to create (sent as a JSON
+        array to the collection url).
+
+        Return values:
+        True, list() -> success (list of per-item results)
+        False, { 'status': http_status, 'errors': errors to be returned }
+        """
+        return False, { 'status': 501 }
+
+    def bulk_update(self, items):
+        """
+        Items will be a list of dicts, each including the id of the object to update.
+        Return values are the same as for bulk_create().
+        """
+        return False, { 'status': 501 }
+
+    def bulk_delete(self, ids):
+        """
+        Ids will be a list of the ids of objects to delete.
+        Return values are the same as for bulk_create().
+        """
+        return False, { 'status': 501 }
+
+    def get_json_backend(self):
+        """
+        Return the EncoderBackend used for JSON request and response bodies.
+        """
+        if (self.fast_json and OrjsonBackend.is_available() and type(self.json_encoder) is DjangboneJSONEncoder
+                and type(self.json_decoder) is json.JSONDecoder):
+            return OrjsonBackend()
+        return JSONBackend(self.json_encoder, self.json_decoder)
+
+    def get_response_backend(self):
+        """
+        Return the EncoderBackend to use for the response, based on the Accept
+        header. JSON is the default (and what wildcards like */* get): one of
+        extra_formats is only used if the header names its content type, with
+        a q-value at least as high as JSON's.
+        """
+        if self.request_type != "form-multipart":
+            qualities = parse_qualities(self.request.META.get('HTTP_ACCEPT', ''))
+            json_quality = JSONBackend.quality(qualities)
+            choice, choice_quality = None, 0.0
+            for backend_class in self.extra_formats:
+                quality = backend_class.quality(qualities, wildcards=False)
+                if quality > choice_quality and quality >= json_quality and backend_class.is_available():
+                    choice, choice_quality = backend_class, quality
+            if choice is not None:
+                return choice()
+        return self.get_json_backend()
+
     def success_response(self, data=None):
-        if data: obj = self.json_encoder.encode(data)
-        else: obj = ""
+        backend = self.get_response_backend()
+        if isinstance(data, StreamedCollection):
+            if backend.streamable:
+                return self.streaming_response(data)
+            data = list(data)
+        with self.metrics.phase('encode'):
+            if data or isinstance(data, list): obj = backend.encode(data)
+            else: obj = b""
         if self.request_type == "form-multipart":
             content_type='text/plain'
         else:
-            obj = obj or "{}"
-            content_type='application/json'
+            obj = obj or backend.encode({})
+            content_type=backend.content_type
+
+        return self.add_response_headers(HttpResponse(obj, content_type=content_type))
 
-        return HttpResponse(obj, content_type=content_type)
+    def get_return_preference(self):
+        """
+        Return the client's Prefer: return=... preference ('minimal' or
+        'representation'), or None if it didn't send one.
+        """
+        for preference in self.request.META.get('HTTP_PREFER', '').split(','):
+            name, _, value = preference.split(';')[0].partition('=')
+            if name.strip().lower() == 'return' and value.strip().lower() in ('minimal', 'representation'):
+                return value.strip().lower()
+        return None
+
+    def get_write_response(self):
+        """
+        Return what a successful POST or PUT of a single item should respond
+        with: 'full', 'changed' or 'minimal' (see write_response).
+        """
+        preference = self.get_return_preference()
+        if preference == 'minimal':
+            return 'minimal'
+        elif preference == 'representation':
+            return 'full'
+        return self.write_response
+
+    def write_success_response(self, data=None):
+        """
+        Build the response for a successful POST or PUT of a single item, which
+        is a 204 with no body if get_write_response() is 'minimal'. (Multipart
+        uploads are always answered with a body, for the iframe they come from.)
+        """
+        preference = self.get_return_preference()
+        if preference:
+            self.response_headers['Preference-Applied'] = 'return=%s' % preference
+        if self.get_write_response() == 'minimal' and self.request_type != "form-multipart":
+            return self.add_response_headers(HttpResponse(status=204))
+        return self.success_response(data)
+
+    def streaming_response(self, items):
+        """
+        Return a StreamingHttpResponse that encodes the items one by one.
+        """
+        response = StreamingHttpResponse(self.encode_stream(items), content_type='application/json')
+        return self.add_response_headers(response)
+
+    def add_response_headers(self, response):
+        """
+        Copy any headers collected in self.response_headers (eg. pagination
+        cursors) onto the response.
+        """
+        for header, value in self.response_headers.items():
+            response[header] = value
+        if self.extra_formats:
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def get_compressor(self):
+        """
+        Return a Compressor instance for the coding in compressors that the
+        client's Accept-Encoding header prefers, or None.
+        """
+        accept_encoding = self.request.META.get('HTTP_ACCEPT_ENCODING', '')
+        best, best_quality = None, 0.0
+        for compressor_class in self.compressors:
+            quality = get_quality(accept_encoding, compressor_class.encoding)
+            if quality > best_quality and compressor_class.is_available():
+                best, best_quality = compressor_class, quality
+        return best() if best else None
+
+    def compress_response(self, response):
+        """
+        Compress the response body, if compress_min_size is set and the body is
+        at least that big (streamed bodies always are), with get_compressor().
+        """
+        if (self.compress_min_size is None or self.request_type == "form-multipart"
+                or response.has_header('Content-Encoding')):
+            return response
+        if not response.streaming and len(response.content) < self.compress_min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressor = self.get_compressor()
+        if compressor is None:
+            return response
+        if response.streaming:
+            if getattr(response, 'is_async', False):
+                response.streaming_content = compressor.acompress_stream(response.streaming_content)
+            else:
+                response.streaming_content = compressor.compress_stream(response.streaming_content)
+            del response['Content-Length']
+        else:
+            content = compressor.compress(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = str(len(content))
+        # The compressed body is no longer byte for byte what a strong ETag promises:
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = compressor.encoding
+        return response
+
+    def encode_stream(self, items):
+        """
+        Encode an iterable of items as a JSON array, yielding a chunk of output
+        every stream_chunk_size items so that neither the items nor the encoded
+        body are ever held in memory all at once.
+        """
+        backend = self.get_response_backend()
+        chunk, separator = [b'['], b''
+        for item in items:
+            chunk.append(separator + backend.encode(item))
+            separator = b','
+            if len(chunk) >= self.stream_chunk_size:
+                yield b''.join(chunk)
+                chunk = []
+        chunk.append(b']')
+        yield b''.join(chunk)
 
     def error_response(self, data=None, status=400):
-        if data: errors = self.json_encoder.encode({"error":data})
-        else: errors = ""
         if self.request_type == "form-multipart":
+            if data: errors = self.get_json_backend().encode({"error":data}).decode('utf-8')
+            else: errors = ""
             errors = "<textarea status='%d'>%s</textarea>"%(status,errors)
             # if we return the errors with a status of 500,
             # firefox puts the response inside a "pre" element...
             # so we need to respond with a 200 code and deal with the error on the client
             return HttpResponse(errors, content_type="text/html")
         else:
-            errors = errors or "{}"
-            return HttpResponse(errors, status=status, content_type="application/json")
+            backend = self.get_response_backend()
+            with self.metrics.phase('encode'):
+                errors = backend.encode({"error":data} if data else {})
+            response = HttpResponse(errors, status=status, content_type=backend.content_type)
+            if self.extra_formats:
+                patch_vary_headers(response, ('Accept',))
+            return response
 
     def get_request_data(self, request):
-        format = request.META.get('CONTENT_TYPE', 'application/json')
-        if format.find("application/x-www-form-urlencoded") != -1:
-            self.request_type = "form"
-            return (request.POST, None)
-        elif format.find("multipart/form-data") != -1:
-            self.request_type = "form-multipart"
-            return (request.POST, request.FILES)
-        else: # fallback to json
-            self.request_type = "json"
-            request_dict = self.json_decoder.decode(request.body)
-            return (request_dict, None)
+        """
+        Parse the request body according to its content type (see
+        get_request_type()), returning a (data, files) tuple. The body is only
+        parsed once per request. Raises ValueError if it is malformed.
+        """
+        if self.request_data is not None:
+            return self.request_data
+        if self.request_type == "form":
+            self.request_data = (request.POST, None)
+        elif self.request_type == "form-multipart":
+            self.request_data = (request.POST, request.FILES)
+        else: # fallback to json (or another format from extra_formats)
+            format = request.META.get('CONTENT_TYPE', 'application/json')
+            backend = self.get_json_backend()
+            for backend_class in self.extra_formats:
+                if backend_class.accepts(format) and backend_class.is_available():
+                    backend = backend_class()
+            self.request_data = (backend.decode(request.body), None)
+        return self.request_data
+
+    def get_validators(self, id=None):
+        """
+        Return an (etag, last_modified) tuple for the resource that a GET would
+        return, ideally without reading the resource itself. last_modified
+        should be a UTC timestamp. Either value may be None.
+
+        If both are None, conditional GETs fall back to an ETag made from a hash
+        of the response body, which saves bandwidth but not the work of building it.
+        """
+        return None, None
+
+    def user_may_read(self, id=None):
+        """
+        Return whether the request's user may read the resource. This is
+        checked before answering a conditional GET without calling read(), so
+        that a 304 doesn't tell users about resources they can't read.
+        """
+        return True
 
     def _get(self, request, *args, **kwargs):
         """
         Handle GET requests, either for a single resource or a collection.
         """
-        data = self.read(kwargs.get('id', None))
-        if data:
-            return self.success_response(data)
+        id = kwargs.get('id', None)
+        etag = last_modified = None
+        if self.conditional_get:
+            etag, last_modified = self.get_validators(id)
+            response = self.not_modified_response(request, etag, last_modified)
+            if response is not None:
+                return response if self.user_may_read(id) else self.error_response(status=404)
+        with self.metrics.phase('read'):
+            data = self.read(id)
+        return self.read_response(request, data, etag, last_modified)
+
+    def not_modified_response(self, request, etag, last_modified):
+        """
+        Return a 304 (or 412) response if the client's copy matches the
+        validators, or None if the resource needs to be sent.
+        """
+        if etag or last_modified:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return self.add_validator_headers(response, etag, last_modified)
+        return None
+
+    def read_response(self, request, data, etag=None, last_modified=None):
+        """
+        Build the response for a GET from the data returned by read().
+        """
+        if data or isinstance(data, list):     # An empty collection is still a valid response
+            response = self.success_response(data)
+            if self.conditional_get and not response.streaming:
+                if not (etag or last_modified):
+                    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified,
+                        response=response)
+                return self.add_validator_headers(response, etag, last_modified)
+            return response
         else:
             return self.error_response(status=404)
 
+    def add_validator_headers(self, response, etag, last_modified):
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
     def _post(self, request, *args, **kwargs):
         try:
             data, files = self.get_request_data(request)
         except ValueError:
             return self.error_response(status=400)
-        success, data = self.create(data, files)
+        bulk = isinstance(data, list)
+        with self.metrics.phase('create'):
+            if bulk:
+                success, data = self.bulk_create(data)
+            else:
+                success, data = self.create(data, files)
 
         if success:
-            return self.success_response(data)
+            return self.success_response(data) if bulk else self.write_success_response(data)
         else:
             return self.error_response(data.get('errors', {}), data.get('status', 400))
 
     def _put(self, request, *args, **kwargs):
         try:
-            id = kwargs['id']
             data, files = self.get_request_data(request)
         except ValueError:
             return HttpResponse('Invalid POST DATA', status=400)
-        except KeyError:
+        if 'id' not in kwargs and not isinstance(data, list):
             raise Http404
-        success, data = self.update(id, data, files)
+        with self.metrics.phase('update'):
+            if 'id' in kwargs:
+                success, data = self.update(kwargs['id'], data, files)
+            else:
+                success, data = self.bulk_update(data)
 
         if success:
-            return self.success_response(data)
+            return self.write_success_response(data) if 'id' in kwargs else self.success_response(data)
         else:
             return self.error_response(data.get('errors', {}), data.get('status', 400))
 
     def _delete(self, request, *args, **kwargs):
-        if not kwargs.has_key('id'):
-            return HttpResponse('DELETE is not supported for collections', status=405)
+        if 'id' not in kwargs:
+            # Collections can only be deleted from in bulk, by sending a list of ids:
+            try:
+                data = self.get_request_data(request)[0] if request.body else None
+            except ValueError:
+                return self.error_response(status=400)
+            if not isinstance(data, list):
+                return HttpResponse('DELETE is not supported for collections', status=405)
+            with self.metrics.phase('delete'):
+                success, data = self.bulk_delete(data)
+            if success:
+                return self.success_response(data)
+            else:
+                return self.error_response(data.get('errors', {}), data.get('status', 400))
         id = kwargs['id']
-        success = self.delete(id)
+        with self.metrics.phase('delete'):
+            success = self.delete(id)
         if success:
             return self.success_response()
         else:
@@ -207,14 +713,180 @@ class ModelAPIView(BackboneAPIView):
     # Optional pagination settings:
     page_size = None            # Set to an integer to enable GET pagination (at the specified page size)
     page_param_name = 'p'       # HTTP GET parameter to use for accessing pages (eg. /widgets?p=2)
+    cursor_pagination = False   # Set to True to paginate with opaque cursors instead of page numbers
+    cursor_ordering = ('pk',)   # Fields the cursor is keyed on (the pk is appended if not included)
+    cursor_param_name = 'cursor'    # HTTP GET parameter to use for cursors (eg. /widgets?cursor=...)
+
+    # Optional total count settings, for paginated collections:
+    total_count = None          # 'exact', 'cached' or 'estimated' to send the collection's size in a header
+    total_count_header = 'X-Total-Count'
+    total_count_timeout = 60    # Seconds that 'cached' counts are kept for (writes through this view expire them)
+    estimate_threshold = 10000  # With 'estimated', counts below this planner estimate are done exactly
+
+    # Optional collection filtering settings. GET parameters that aren't listed are ignored:
+    filter_fields = ()          # Allowed GET filters, eg. ('status', 'size__gte', 'owner__in')
+    ordering_fields = ()        # Fields that collections can be ordered by, eg. ?order=-created_at,name
+    ordering_param_name = 'order'   # HTTP GET parameter to use for ordering
+    sparse_fields = False       # Set to True to let clients pick a subset of serialize_fields, eg. ?fields=id,name
+    fields_param_name = 'fields'    # HTTP GET parameter to use for sparse fieldsets
+
+    # Optional streaming settings:
+    stream_collections = False  # Set to True to stream collection GETs instead of building them in memory
+
+    # Optional conditional GET settings (see BackboneAPIView.conditional_get):
+    modified_field = None       # Name of a DateTimeField that's updated on every save, eg. 'updated_at'
+
+    # Optional delta sync settings (these also need modified_field):
+    delta_sync = False          # Set to True to support fetching only the changes since a sync token
+    since_param_name = 'since'  # HTTP GET parameter for sync tokens (eg. /widgets?since=...)
+    tombstone_retention = None  # timedelta after which tombstones may be pruned, forcing older clients to resync
+    sync_overlap = 5            # Seconds that syncs overlap by, to catch writes committed after the previous token
+
+    # Optional response cache settings:
+    cache_alias = None          # Name of a cache in settings.CACHES (eg. 'default') to enable caching of GET responses
+    cache_timeout = 300         # Number of seconds to keep cached responses for
+    cache_per_user = None       # Whether responses vary with the requesting user; None means if permission hooks are overridden
 
     # Override these attributes with ModelForm instances to support PUT and POST requests:
     add_form_class = None       # Form class to be used for POST requests
     edit_form_class = None      # Form class to be used for PUT requests
+    validate_fields = None      # Model fields (or '__all__') to validate POST/PUT data for without forms
+
+    # Optional bulk settings:
+    allow_bulk = False          # Set to True to accept JSON arrays for POST, PUT and DELETE on the collection url
+    bulk_atomic = True          # If True, a bulk request with any invalid item doesn't save anything
+
+    # Optional database routing settings (None means the database chosen by your routers):
+    read_db_alias = None        # Database alias (eg. a replica) to read GET responses from
+    write_db_alias = None       # Database alias to write to, and to read from in writes
+    read_your_writes = 0        # Seconds after a client writes during which its GETs use write_db_alias
+    lock_for_update = False     # Set to True to select_for_update() the instance in PUTs and DELETEs
+
+    # Optional change event settings (see djangbone.events):
+    event_broker = None         # Broker instance to publish an event to after every successful write
 
     def user_has_perm(self, request, obj, action=None):
+        """
+        Return True if the request's user may perform the action on obj. For
+        'create' actions, obj is None.
+        """
         return True
 
+    def user_has_collection_perm(self, request, action='read_collection'):
+        """
+        Return True if the request's user may read the collection; use
+        filter_queryset_for_user() to hide individual rows.
+
+        By default, a view that overrides user_has_perm() has it called with
+        the collection's first object, as it always has been (an empty
+        collection is always readable).
+        """
+        if not self.get_metadata().checks_object_perms:
+            return True
+        first = list(self.get_queryset(action)[:1])
+        return not first or self.user_has_perm(request, first[0], action)
+
+    def filter_queryset_for_user(self, request, queryset, action=None):
+        """
+        Return the subset of queryset that the request's user may perform the
+        action ('read_single_item', 'read_collection', 'update' or 'delete') on.
+
+        Override this to push row-level permissions into SQL; rows that are
+        filtered out behave as if they don't exist. user_has_perm() is still
+        checked for each object as well.
+        """
+        return queryset
+
+    _metadata = None
+
+    def get_metadata(self):
+        """
+        Return the ViewMetadata for this view's model and serialize_fields,
+        which is built on first use and cached on the view class.
+        """
+        metadata = type(self).__dict__.get('_metadata')
+        if metadata is None:
+            metadata = type(self)._metadata = {}
+        key = (self.base_queryset.model, tuple(self.serialize_fields or ()))
+        if key not in metadata:
+            metadata[key] = ViewMetadata(type(self), *key)
+        return metadata[key]
+
+    def get_queryset(self, action=None):
+        """
+        Return base_queryset filtered for the requesting user and the action, on
+        the database for the action (see get_db_alias()).
+        """
+        queryset = self.filter_queryset_for_user(self.request, self.base_queryset, action)
+        alias = self.get_db_alias(action)
+        if alias:
+            queryset = queryset.using(alias)
+        if self.lock_for_update and action in ('update', 'delete'):
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def get_db_alias(self, action=None):
+        """
+        Return the database alias to use for an action: read_db_alias for GETs,
+        unless the client wrote within the last read_your_writes seconds, and
+        write_db_alias for everything else. None means the routers decide.
+        """
+        if action in ('read_single_item', 'read_collection') and self.read_db_alias and not self.wrote_recently():
+            return self.read_db_alias
+        return self.write_db_alias
+
+    def get_write_db(self):
+        """
+        Return the alias of the database that writes actually go to:
+        write_db_alias, or the one the routers pick for the model. Write
+        transactions (and so lock_for_update's row locks) are opened on it.
+        """
+        return self.write_db_alias or router.db_for_write(self.base_queryset.model)
+
+    last_write_key = 'djangbone_last_write'
+
+    def wrote_recently(self):
+        """
+        Return True if the client has written within the last read_your_writes
+        seconds, according to its session (or a cookie, if there isn't one).
+        """
+        if not self.read_your_writes:
+            return False
+        session = getattr(self.request, 'session', None)
+        last_write = session.get(self.last_write_key) if session is not None else self.request.COOKIES.get(self.last_write_key)
+        try:
+            return time.time() - float(last_write) < self.read_your_writes
+        except (TypeError, ValueError):
+            return False
+
+    def finish_request(self, response):
+        if self.read_your_writes and getattr(self, 'last_write', None):
+            session = getattr(self.request, 'session', None)
+            if session is not None:
+                session[self.last_write_key] = self.last_write
+            else:
+                response.set_cookie(self.last_write_key, str(self.last_write), max_age=self.read_your_writes)
+        return super(ModelAPIView, self).finish_request(response)
+
+    def get_write_manager(self):
+        """
+        Return the model's default manager, on write_db_alias if it is set.
+        """
+        manager = self.base_queryset.model._default_manager
+        return manager.db_manager(self.write_db_alias) if self.write_db_alias else manager
+
+    def save_form(self, form):
+        """
+        Save a ModelForm's instance to write_db_alias (or wherever the routers
+        send it), returning the instance.
+        """
+        if not self.write_db_alias:
+            return form.save()
+        instance = form.save(commit=False)
+        instance.save(using=self.write_db_alias)
+        form.save_m2m()
+        return instance
+
     def serialize_qs(self, queryset, single_object=False):
         """
         Serialize a queryset into a JSON object that can be consumed by backbone.js.
@@ -222,43 +894,473 @@ class ModelAPIView(BackboneAPIView):
         If the single_object argument is True, or the url specified an id, return a
         single JSON object, otherwise return a JSON array of objects.
         """
-        values = queryset.values(*self.serialize_fields) if self.serialize_fields else queryset.values()
+        cursor_fields = []
+        if self.serialize_fields and self.uses_cursor_pagination() and not (self.kwargs.get('id') or single_object):
+            # The next cursor is built from the last row, so make sure the
+            # ordering fields are fetched even if they aren't serialized:
+            cursor_fields = [f for f in self.get_cursor_field_names() if f not in self.serialize_fields]
+        fields = tuple(self.serialize_fields or ()) + tuple(cursor_fields)
+        values = queryset.values(*fields) if fields else queryset.values()
         if self.kwargs.get('id') or single_object:
             # For single-item requests, convert ValuesQueryset to a dict simply
             # by slicing the first item:
            return (values[0] if len(values) else {})
         else:
-            # Process pagination options if they are enabled:
-            if isinstance(self.page_size, int):
-                try:
-                    page_number = int(self.request.GET.get(self.page_param_name, 1))
-                    offset = (page_number - 1) * self.page_size
-                except ValueError:
-                    offset = 0
-                values = values[offset:offset+self.page_size]
+            self.add_total_count(values)
+            values = self.paginate_qs(values)
+            for row in (values if cursor_fields else ()):
+                for field in cursor_fields: del row[field]
+            if self.stream_collections:
+                return StreamedCollection(self.iterate_rows(values))
             return list(values)
 
-    def read_single_item(self, id):
+    def iterate_rows(self, rows):
         """
-        Handle a GET request for a single model instance.
+        Iterate over a paginated queryset (in chunks) or an already-fetched page.
+        """
+        if isinstance(rows, QuerySet):
+            return rows.iterator(chunk_size=self.stream_chunk_size)
+        return iter(rows)
+
+    def user_may_read(self, id=None):
+        """
+        Check the same permissions as read_single_item() or read_collection().
+        """
+        if not id:
+            return self.user_has_collection_perm(self.request, 'read_collection')
+        if not self.get_metadata().checks_object_perms:
+            return True
+        instance = self.get_object(id, 'read_single_item')
+        return instance is not None and self.user_has_perm(self.request, instance, 'read_single_item')
+
+    def get_validators(self, id=None):
+        """
+        If modified_field is set, build the validators for a GET from a single
+        aggregate query: the latest modification time and the number of rows
+        (which changes when rows are deleted). The ETag also covers the request's
+        path and query string, so each page gets its own.
+
+        Collections only get the ETag: their latest modification time doesn't
+        change when a row is deleted, so If-Modified-Since would get a stale 304.
+        """
+        if not self.modified_field:
+            return None, None
+        if id:
+            qs = self.get_queryset('read_single_item').filter(pk=id)
+        else:
+            qs = self.filter_collection_qs(self.get_queryset('read_collection'))
+        try:
+            stats = qs.aggregate(last_modified=Max(self.modified_field), count=Count('pk'))
+        except ValueError:
+            return None, None
+        if not stats['count']:
+            return None, None
+        last_modified = stats['last_modified']
+        etag = hashlib.md5(('%s.%s:%s:%s:%s:%s' % (self.__module__, self.__class__.__name__,
+                self.request.get_full_path(), self.request.META.get('HTTP_ACCEPT', ''),
+                last_modified, stats['count'])).encode('utf-8')).hexdigest()
+        timestamp = calendar.timegm(last_modified.utctimetuple()) if last_modified and id else None
+        return quote_etag(etag), timestamp
+
+    def paginate_qs(self, queryset):
+        """
+        Slice the queryset down to the requested page, if pagination is enabled.
+
+        With cursor pagination the page is fetched straight away (so that the
+        next cursor can be built from it) and returned as a list.
+        """
+        if self.uses_cursor_pagination():
+            return self.paginate_qs_by_cursor(queryset)
+        if isinstance(self.page_size, int):
+            try:
+                page_number = int(self.request.GET.get(self.page_param_name, 1))
+                offset = (page_number - 1) * self.page_size
+            except ValueError:
+                offset = 0
+            queryset = queryset[offset:offset+self.page_size]
+        return queryset
+
+    def add_total_count(self, queryset):
+        """
+        Add the size of a paginated collection to the response headers, counted
+        with the total_count strategy. Estimated counts are flagged with an extra
+        "<total_count_header>-Estimated: true" header.
+        """
+        if not self.total_count or not isinstance(self.page_size, int):
+            return
+        count, estimated = self.get_total_count(queryset)
+        self.response_headers[self.total_count_header] = str(count)
+        if estimated:
+            self.response_headers[self.total_count_header + '-Estimated'] = 'true'
+
+    def get_total_count(self, queryset):
+        """
+        Return a (count, estimated) tuple for the queryset.
+        """
+        if self.total_count == 'estimated':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate, True
+        if self.total_count == 'cached':
+            return self.get_cached_count(queryset), False
+        return queryset.count(), False
+
+    def get_cached_count(self, queryset):
+        """
+        Count the queryset, caching the result for total_count_timeout seconds.
+        The cache key includes the model's cache version, so that writes made
+        through views with caching or cached counts enabled expire it.
         """
         try:
-            qs = self.base_queryset.filter(id=id)
-            assert len(qs) == 1
-        except AssertionError:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+        key = 'djangbone:count:%s:%s:%s' % (self.get_metadata().label, self.get_cache_version(),
+                hashlib.md5(sql.encode('utf-8')).hexdigest())
+        count = self.get_cache().get(key)
+        if count is None:
+            count = queryset.count()
+            self.get_cache().set(key, count, self.total_count_timeout)
+        return count
+
+    def estimate_count(self, queryset):
+        """
+        Return the query planner's estimate of the number of rows in the
+        queryset, or None if it isn't available (only PostgreSQL is supported).
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        try:
+            sql, params = queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+        except (DatabaseError, EmptyResultSet):
+            return None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def uses_cursor_pagination(self):
+        return self.cursor_pagination and isinstance(self.page_size, int)
+
+    def get_cursor_ordering(self):
+        """
+        Return the ordering used for cursor pagination, which always ends with
+        the primary key so that every row has a unique position.
+
+        Requested orderings may only use local, non-null fields, since NULLs
+        can't be compared with in the keyset filter.
+        """
+        requested = self.get_ordering()
+        if requested:
+            invalid = [f for f in requested if not self.is_cursor_field(f.lstrip('-'))]
+            if invalid:
+                raise InvalidRequest('Invalid ordering for cursor pagination: %s' % ', '.join(invalid))
+        ordering = list(requested or self.cursor_ordering)
+        pk_name = self.get_metadata().pk_name
+        if not [f for f in ordering if f.lstrip('-') in ('pk', pk_name)]:
+            ordering.append(pk_name)
+        return ordering
+
+    def is_cursor_field(self, name):
+        if name == 'pk':
+            return True
+        try:
+            field = self.get_metadata().model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return field.concrete and not field.many_to_many and not field.null
+
+    def get_cursor_field_names(self):
+        return [f.lstrip('-') for f in self.get_cursor_ordering()]
+
+    def paginate_qs_by_cursor(self, queryset):
+        """
+        Return the page of rows following the position given by the cursor GET
+        parameter, using a keyset filter rather than an OFFSET. If there are
+        more rows, the cursor for the next page is added to the response headers.
+
+        Missing, invalid or tampered cursors fall back to the first page.
+        """
+        ordering = self.get_cursor_ordering()
+        queryset = queryset.order_by(*ordering)
+        position = self.decode_cursor(self.request.GET.get(self.cursor_param_name), ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_cursor_filter(ordering, position))
+        rows = list(queryset[:self.page_size + 1])
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            position = [self.get_cursor_value(rows[-1], f) for f in self.get_cursor_field_names()]
+            self.set_next_cursor(self.encode_cursor(ordering, position))
+        return rows
+
+    def get_cursor_filter(self, ordering, position):
+        """
+        Build a Q object matching the rows that come after the given position,
+        ie. (a > x) OR (a = x AND b > y) OR ... for an ordering of (a, b, ...).
+        """
+        cursor_filter = Q()
+        for i, field in enumerate(ordering):
+            lookup = '%s__%s' % (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt')
+            clause = Q(**{lookup: position[i]})
+            for previous_field, value in zip(ordering[:i], position[:i]):
+                clause &= Q(**{previous_field.lstrip('-'): value})
+            cursor_filter |= clause
+        return cursor_filter
+
+    def get_cursor_value(self, row, name):
+        """
+        Read the value of one of the cursor ordering fields from a row, which
+        is either a dict (from .values()) or a model instance.
+        """
+        metadata = self.get_metadata()
+        attname = metadata.pk_attname if name == 'pk' else metadata.model._meta.get_field(name).attname
+        if isinstance(row, dict):
+            return row[name] if name in row else row[attname]
+        return getattr(row, attname)
+
+    def encode_cursor(self, ordering, position):
+        return signing.dumps({'o': ordering, 'v': position}, salt='djangbone.cursor',
+                serializer=CursorSerializer, compress=True)
+
+    def decode_cursor(self, cursor, ordering):
+        """
+        Return the position stored in the cursor, or None if it is missing,
+        invalid, tampered with, or was built for a different ordering.
+        """
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt='djangbone.cursor', serializer=CursorSerializer)
+            position = data['v']
+            assert data['o'] == ordering and len(position) == len(ordering)
+        except (signing.BadSignature, ValueError, TypeError, KeyError, AssertionError):
+            return None
+        return position
+
+    def set_next_cursor(self, cursor):
+        """
+        Send the next page's cursor back to the client, both as an X-Next-Cursor
+        header and as a Link header with rel="next".
+        """
+        params = self.request.GET.copy()
+        params[self.cursor_param_name] = cursor
+        self.response_headers['X-Next-Cursor'] = cursor
+        self.response_headers['Link'] = '<%s?%s>; rel="next"' % (self.request.path, params.urlencode())
+
+    def get_object(self, id, action=None):
+        """
+        Fetch the model instance with the given id from get_queryset(action) in a
+        single query, returning None if it doesn't exist.
+        """
+        try:
+            return self.get_queryset(action).get(pk=id)
+        except (ObjectDoesNotExist, MultipleObjectsReturned, ValueError):
+            return None
+
+    def serialize_instance(self, instance):
+        """
+        Serialize a model instance that has already been fetched (or just saved)
+        to the same dict that serialize_qs() would produce for it, without going
+        back to the database.
+
+        This is only possible when all of serialize_fields are local columns, and
+        serialize_qs() isn't overridden; otherwise (eg. for lookups that span
+        relationships) the instance is re-read through serialize_qs().
+        """
+        metadata = self.get_metadata()
+        if metadata.lookup_fields or metadata.custom_serialize_qs:
+            return self.reserialize_instance(instance)
+        return dict((name, getattr(instance, field.attname)) for name, field in metadata.instance_fields)
+
+    def reserialize_instance(self, instance):
+        """
+        Serialize an instance by re-reading it through serialize_qs(), so that
+        single items get the same output as collections.
+        """
+        wrapper_qs = self.base_queryset.using(instance._state.db).filter(pk=instance.pk)
+        return self.serialize_qs(wrapper_qs, single_object=True)
+
+    def serialize_written(self, instance, changed=None):
+        """
+        Serialize an instance that was just created or updated, for the
+        response that get_write_response() asks for: nothing for 'minimal', and
+        for 'changed' updates (changed is the list of field names that the
+        update changed) only the pk and the changed fields.
+
+        Lookups through relationships are only re-read if the relationship
+        itself changed, so 'changed' responses don't query the database again.
+        """
+        write_response = self.get_write_response()
+        if write_response == 'minimal':
+            return None
+        if write_response != 'changed' or changed is None:
+            return self.serialize_instance(instance)
+        metadata = self.get_metadata()
+        if metadata.custom_serialize_qs or [name for name in metadata.lookup_fields if name.split('__')[0] in changed]:
+            return self.serialize_instance(instance)
+        return dict((name, getattr(instance, field.attname)) for name, field in metadata.instance_fields
+                if field.primary_key or field.name in changed)
+
+    def read(self, id=None):
+        if self.sparse_fields:
+            self.serialize_fields = self.get_sparse_fields()
+        return super(ModelAPIView, self).read(id)
+
+    def get_sparse_fields(self):
+        """
+        Return the subset of serialize_fields requested with the fields_param_name
+        GET parameter (always including the id), or serialize_fields if there
+        wasn't one.
+        """
+        requested = self.request.GET.get(self.fields_param_name)
+        if not requested or not self.serialize_fields:
+            return self.serialize_fields
+        requested = [f.strip() for f in requested.split(',') if f.strip()]
+        invalid = [f for f in requested if f not in self.serialize_fields]
+        if invalid:
+            raise InvalidRequest('Unknown fields: %s' % ', '.join(invalid))
+        return tuple(f for f in self.serialize_fields if f in requested or f in ('id', 'pk'))
+
+    def get_ordering(self):
+        """
+        Return the ordering requested with the ordering_param_name GET parameter
+        as a list of field names (with a '-' prefix for descending order), or
+        None if there wasn't one.
+        """
+        requested = self.request.GET.get(self.ordering_param_name)
+        if not requested or not self.ordering_fields:
             return None
-        if not self.user_has_perm(self.request, qs[0], 'read_single_item'):
+        ordering = [f.strip() for f in requested.split(',') if f.strip()]
+        invalid = [f for f in ordering if f.lstrip('-') not in self.ordering_fields]
+        if invalid:
+            raise InvalidRequest('Invalid ordering: %s' % ', '.join(invalid))
+        return ordering
+
+    def filter_collection_qs(self, queryset):
+        """
+        Apply the filters in the GET parameters that are listed in filter_fields,
+        and the requested ordering, to the queryset. Values for __in and __range
+        lookups are comma-separated, and __isnull takes 'true' or 'false'.
+        """
+        for lookup in self.filter_fields:
+            if lookup not in self.request.GET:
+                continue
+            value = self.request.GET[lookup]
+            if lookup.endswith('__in') or lookup.endswith('__range'):
+                value = value.split(',')
+            elif lookup.endswith('__isnull'):
+                value = value.lower() in ('1', 'true', 'yes')
+            try:
+                queryset = queryset.filter(**{ lookup: value })
+            except (ValueError, TypeError, ValidationError):
+                raise InvalidRequest('Invalid value for %s' % lookup)
+        ordering = self.get_ordering()
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def read_single_item(self, id):
+        """
+        Handle a GET request for a single model instance.
+        """
+        instance = self.get_object(id, 'read_single_item')
+        if instance is None or not self.user_has_perm(self.request, instance, 'read_single_item'):
             return None
-        return self.serialize_qs(qs)
+        with self.metrics.phase('serialize'):
+            return self.serialize_instance(instance)
 
     def read_collection(self):
         """
         Handle a GET request for a full collection (when no id was provided).
         """
-        qs = self.base_queryset
-        if not self.user_has_perm(self.request, qs[0], 'read_collection'):
+        if not self.user_has_collection_perm(self.request, 'read_collection'):
             return None
-        return self.serialize_qs(qs)
+        qs = self.filter_collection_qs(self.get_queryset('read_collection'))
+        if self.delta_sync and self.modified_field:
+            since = self.request.GET.get(self.since_param_name)
+            if since is not None:
+                return self.read_changes(qs, since)
+            # Full fetches tell the client where to sync from next time:
+            self.response_headers['X-Sync-Token'] = self.get_sync_token()
+        with self.metrics.phase('serialize'):
+            return self.serialize_qs(qs)
+
+    def read_changes(self, queryset, since):
+        """
+        Handle a collection GET with a sync token in the since_param_name GET
+        parameter, returning only what changed since the token was issued:
+
+            { "changed": [...objects modified since then...],
+              "deleted": [...ids of objects deleted since then...],
+              "sync_token": "...token to use for the next sync..." }
+
+        The changes aren't paginated. If the token is invalid, or older than
+        tombstone_retention, the response is { "reset": true } and the client
+        should fetch the whole collection again.
+
+        Changes from the last sync_overlap seconds before the token are sent
+        again, which is harmless since Backbone merges them by id.
+        """
+        since_time = self.decode_sync_token(since)
+        if since_time is None or (self.tombstone_retention and
+                since_time < timezone.now() - self.tombstone_retention):
+            return { 'reset': True }
+        changed_qs = queryset.filter(**{ '%s__gte' % self.modified_field: since_time })
+        # Changes are sent as a single object, so disable pagination and streaming:
+        self.page_size = None
+        self.stream_collections = False
+        # The new token is taken before the reads, which share a transaction (and so a
+        # snapshot, on databases with repeatable reads), so no change falls between them:
+        with transaction.atomic(using=queryset.db):
+            sync_token = self.get_sync_token()
+            deleted = self.get_tombstone_model().objects.using(queryset.db).filter(
+                    model_label=self.get_metadata().label, deleted_at__gte=since_time)
+            deleted = list(deleted.values_list('object_id', flat=True))
+            with self.metrics.phase('serialize'):
+                changed = list(self.serialize_qs(changed_qs))
+        return {
+            'changed': changed,
+            'deleted': list(set(deleted)),
+            'sync_token': sync_token,
+        }
+
+    def get_sync_token(self):
+        """
+        Return an opaque token for use with ?since=. It holds the current time
+        less sync_overlap seconds, since rows are timestamped when they're
+        written, which can be a little before their transaction commits.
+        """
+        since_time = timezone.now() - datetime.timedelta(seconds=self.sync_overlap)
+        return signing.dumps(since_time.isoformat(), salt='djangbone.sync')
+
+    def get_tombstone_model(self):
+        """
+        Return the model that deletions are recorded in for delta syncs. The
+        default needs 'djangbone.tombstones' in INSTALLED_APPS; override this to
+        use another model with the same fields.
+        """
+        from djangbone.tombstones.models import Tombstone
+        return Tombstone
+
+    def decode_sync_token(self, token):
+        """
+        Return the datetime stored in a sync token, or None if it's invalid.
+        Plain ISO 8601 timestamps are also accepted.
+        """
+        try:
+            timestamp = signing.loads(token, salt='djangbone.sync')
+        except signing.BadSignature:
+            timestamp = token
+        try:
+            since_time = parse_datetime(timestamp)
+        except (ValueError, TypeError):
+            return None
+        if since_time is not None and timezone.is_naive(since_time) and timezone.is_aware(timezone.now()):
+            since_time = timezone.make_aware(since_time)
+        return since_time
 
     def create(self, data={}, files={}):
         """
@@ -271,24 +1373,25 @@ class ModelAPIView(BackboneAPIView):
         Backbone.js will send the new object's attributes as json in the request body,
         so use our json decoder on it, rather than looking at request.POST.
         """
-        if self.add_form_class == None:
+        if self.add_form_class == None and self.validate_fields is None:
             return False, { 'status': 501 }
         if not self.user_has_perm(self.request, None, 'create'):
             return False, { 'status': 403 }
+        if self.validate_fields is not None:
+            return self.create_validated(data)
         form = self.add_form_class(data, files)
         if hasattr(form, 'set_request'):
             form.set_request(self.request)
         if form.is_valid():
-            new_object = form.save()
-            logger.info("%s:CREATE:SUCCESS:%s: id=%s, data=%s, files=%s"%\
-                    (self.base_queryset.model.__name__, self.request.user.username, new_object.pk, logging_dict(data), logging_dict(files)))
-            # Serialize the new object to json using our built-in methods.
-            # The extra DB read here is not ideal, but it keeps the code DRY:
-            wrapper_qs = self.base_queryset.filter(id=new_object.id)
-            return True, self.serialize_qs(wrapper_qs, single_object=True)
+            # Nested in another transaction (eg. ATOMIC_REQUESTS), errors here fail the
+            # whole request anyway, so don't spend queries on a savepoint:
+            with transaction.atomic(using=self.get_write_db(), savepoint=False):
+                new_object = self.save_form(form)
+                self.audit('CREATE', 'SUCCESS', id=new_object.pk, data=data, files=files)
+                self.after_write('create', [new_object.pk])
+            return True, self.serialize_written(new_object)
         else:
-            logger.warning("%s:CREATE:ERROR:%s: data=%s, files=%s, errors=%s"%\
-                    (self.base_queryset.model.__name__, self.request.user.username, logging_dict(data), logging_dict(files), logging_dict(form.errors)))
+            self.audit('CREATE', 'ERROR', logging.WARNING, data=data, files=files, errors=form.errors)
             return False, { 'errors': form.errors, 'status': 400 }
 
     def update(self, id, data={}, files={}):
@@ -298,70 +1401,465 @@ class ModelAPIView(BackboneAPIView):
         This view will only do something if BackboneAPIView.edit_form_class is specified
         by the subclass. This should be a ModelForm corresponding to the model used by
         base_queryset.
+
+        The instance is read and saved in one transaction (see get_write_db()), and
+        with lock_for_update the row stays locked until it's saved, so that
+        concurrent PUTs can't interleave.
         """
-        if self.edit_form_class == None:
+        if self.edit_form_class == None and self.validate_fields is None:
             return False, { 'status': 501 }
-        qs = self.base_queryset.filter(pk=id)
-        if not len(qs) == 1:
-            return False, { 'status': 404 }
-        instance = qs[0]
-        if not self.user_has_perm(self.request, instance, 'update'):
-            return False, { 'status': 404 }
+        with transaction.atomic(using=self.get_write_db(), savepoint=False):
+            instance = self.get_object(id, 'update')
+            if instance is None or not self.user_has_perm(self.request, instance, 'update'):
+                return False, { 'status': 404 }
+            return self.update_instance(instance, data, files)
+
+    def update_instance(self, instance, data={}, files={}):
+        """
+        Validate the data with edit_form_class (or validate_fields) and save it
+        to the instance.
+        """
+        if self.validate_fields is not None:
+            return self.update_validated(instance, data)
         form = self.edit_form_class(data, files, instance=instance)
         if hasattr(form, 'set_request'):
             form.set_request(self.request)
-        data_diff = get_data_diff(qs, data)
+        # The diff has to be taken before validation, but only if it will be logged:
+        data_diff = get_instance_diff(instance, data) if logger.isEnabledFor(logging.INFO) else None
         if form.is_valid():
-            logger.info("%s:UPDATE:SUCCESS:%s: id=%s, updated_data=%s, files=%s"%\
-                    (self.base_queryset.model.__name__, self.request.user.username, instance.pk, data_diff, logging_dict(files)))
-            item = form.save()
-            wrapper_qs = self.base_queryset.filter(id=item.id)
-            return True, self.serialize_qs(wrapper_qs, single_object=True)
+            self.audit('UPDATE', 'SUCCESS', id=instance.pk, updated_data=data_diff, files=files)
+            item = self.save_form(form)
+            self.after_write('update', [item.pk])
+            return True, self.serialize_written(item, form.changed_data)
         else:
-            logger.info("%s:UPDATE:ERROR:%s: id=%s, updated_data=%s, files=%s"%\
-                    (self.base_queryset.model.__name__, self.request.user.username, instance.pk, data_diff, logging_dict(files)))
+            self.audit('UPDATE', 'ERROR', id=instance.pk, updated_data=data_diff, files=files)
             return False, { 'errors': form.errors, 'status': 400 }
 
+    _validators = None
+
+    def get_validator(self):
+        """
+        Return the ModelValidator for this view's model and validate_fields,
+        which is built on first use and cached on the view class.
+        """
+        validators = type(self).__dict__.get('_validators')
+        if validators is None:
+            validators = type(self)._validators = {}
+        fields = self.validate_fields if self.validate_fields == '__all__' else tuple(self.validate_fields)
+        key = (self.base_queryset.model, fields)
+        if key not in validators:
+            from djangbone.validation import ModelValidator     # Only needed (with django.forms) by views that use it
+            validators[key] = ModelValidator(*key)
+        return validators[key]
+
+    def create_validated(self, data):
+        """
+        Handle a POST with validate_fields set: validate the data with
+        get_validator() instead of a form, and insert the new instance.
+        """
+        instance = self.base_queryset.model()
+        changed, errors = self.get_validator().validate(data, instance)
+        if errors:
+            self.audit('CREATE', 'ERROR', logging.WARNING, data=data, errors=errors)
+            return False, { 'errors': errors, 'status': 400 }
+        with transaction.atomic(using=self.get_write_db(), savepoint=False):
+            instance.save(using=self.write_db_alias)
+            self.audit('CREATE', 'SUCCESS', id=instance.pk, data=data)
+            self.after_write('create', [instance.pk])
+        return True, self.serialize_written(instance)
+
+    def update_validated(self, instance, data):
+        """
+        Handle a PUT with validate_fields set: validate the data with
+        get_validator() instead of a form, and save only the fields that
+        changed (along with any auto_now fields) with save(update_fields=...).
+        Nothing is written if no values changed.
+        """
+        data_diff = get_instance_diff(instance, data) if logger.isEnabledFor(logging.INFO) else None
+        validator = self.get_validator()
+        changed, errors = validator.validate(data, instance)
+        if errors:
+            self.audit('UPDATE', 'ERROR', id=instance.pk, updated_data=data_diff)
+            return False, { 'errors': errors, 'status': 400 }
+        self.audit('UPDATE', 'SUCCESS', id=instance.pk, updated_data=data_diff)
+        if changed:
+            instance.save(update_fields=changed + validator.auto_now_fields)
+            self.after_write('update', [instance.pk])
+        return True, self.serialize_written(instance, changed)
+
     def delete(self, id):
         """
         Respond to DELETE requests by deleting the model
         """
-        qs = self.base_queryset.filter(id=id)
-        if qs:
-            if not self.user_has_perm(self.request, qs[0], 'delete'):
+        with transaction.atomic(using=self.get_write_db(), savepoint=False):
+            instance = self.get_object(id, 'delete')
+            if instance is None or not self.user_has_perm(self.request, instance, 'delete'):
                 return False
-            logger.info("%s:DELETE:SUCCESS:%s: id=%s"%\
-                    (self.base_queryset.model.__name__, self.request.user.username, qs[0].pk))
-            qs.delete()
-            return True
-        else:
-            return False
+            return self.delete_instance(instance)
+
+    def delete_instance(self, instance):
+        """
+        Delete the instance, returning True.
+        """
+        self.audit('DELETE', 'SUCCESS', id=instance.pk)
+        pk = instance.pk
+        instance.delete()
+        self.after_write('delete', [pk])
+        return True
+
+    def bulk_create(self, items):
+        """
+        Handle a POST request with a JSON array body by adding several new model
+        instances in a single transaction.
+
+        Each item is validated with add_form_class, and all the valid ones are
+        written with one bulk_create() query. The response is a list with the
+        serialized object (or the errors) for each item, in the order they were
+        sent. If bulk_atomic is True and any item is invalid, nothing is saved.
+
+        As with bulk_create() itself, save() is not called on the instances (the
+        forms are saved with commit=False), and no signals are sent.
+        """
+        if not self.allow_bulk or self.add_form_class == None:
+            return False, { 'status': 501 }
+        if not self.user_has_perm(self.request, None, 'create'):
+            return False, { 'status': 403 }
+        forms = []
+        for item in items:
+            form = self.add_form_class(item if isinstance(item, dict) else {}, None)
+            if hasattr(form, 'set_request'):
+                form.set_request(self.request)
+            forms.append(form)
+        errors = [None if form.is_valid() else { 'status': 400, 'errors': form.errors } for form in forms]
+        if self.bulk_atomic and any(errors):
+            self.audit('BULK_CREATE', 'ERROR', logging.WARNING, count=len(items), errors=errors)
+            return False, { 'errors': errors, 'status': 400 }
+
+        valid_forms = [form for form, error in zip(forms, errors) if error is None]
+        with transaction.atomic(using=self.get_write_db()):
+            instances = self.get_write_manager().bulk_create(
+                    [form.save(commit=False) for form in valid_forms])
+            for form in valid_forms:
+                form.save_m2m()
+        self.audit('BULK_CREATE', 'SUCCESS', ids=[i.pk for i in instances])
+        self.after_write('create', [i.pk for i in instances])
+        return True, self.bulk_results(errors, iter(instances))
+
+    def bulk_update(self, items):
+        """
+        Handle a PUT request with a JSON array body by editing several existing
+        model instances in a single transaction.
+
+        Every item must include the id of the instance to update. The instances
+        are fetched with one query, each item is validated with edit_form_class,
+        and the changes are written with one bulk_update() query. The response
+        is in the same format as for bulk_create().
+        """
+        if not self.allow_bulk or self.edit_form_class == None:
+            return False, { 'status': 501 }
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        # The instances are read in the same transaction they're written in, so
+        # that lock_for_update's row locks are held until then:
+        with transaction.atomic(using=self.get_write_db()):
+            try:
+                existing = dict((str(pk), obj) for pk, obj in self.get_queryset('update').in_bulk(ids).items())
+            except (ValueError, TypeError):
+                return False, { 'status': 400 }
+            return self.bulk_update_instances(items, ids, existing)
+
+    def bulk_update_instances(self, items, ids, existing):
+        """
+        Validate and save the items of a bulk update, given the existing
+        instances ({ str(pk): instance }) that they may update.
+        """
+
+        forms, errors = [], []
+        for item in items:
+            instance = existing.get(str(item.get('id'))) if isinstance(item, dict) else None
+            if instance is None or not self.user_has_perm(self.request, instance, 'update'):
+                forms.append(None)
+                errors.append({ 'status': 404 })
+                continue
+            form = self.edit_form_class(item, None, instance=instance)
+            if hasattr(form, 'set_request'):
+                form.set_request(self.request)
+            forms.append(form)
+            errors.append(None if form.is_valid() else { 'status': 400, 'errors': form.errors })
+        if self.bulk_atomic and any(errors):
+            self.audit('BULK_UPDATE', 'ERROR', ids=ids, errors=errors)
+            return False, { 'errors': errors, 'status': 400 }
+
+        valid_forms = [form for form, error in zip(forms, errors) if error is None]
+        instances = [form.save(commit=False) for form in valid_forms]
+        writable_fields, update_fields = self.get_bulk_update_fields(), set()
+        for form in valid_forms:
+            update_fields.update(name for name in form.fields if name in writable_fields)
+        # bulk_update() doesn't call save(), so auto_now fields need updating by hand:
+        auto_now_fields = self.get_metadata().auto_now_fields
+        for instance in instances:
+            for field in auto_now_fields:
+                field.pre_save(instance, False)
+        update_fields.update(f.name for f in auto_now_fields)
+        if instances and update_fields:
+            self.get_write_manager().bulk_update(instances, sorted(update_fields))
+        for form in valid_forms:
+            form.save_m2m()
+        self.audit('BULK_UPDATE', 'SUCCESS', ids=[i.pk for i in instances], fields=sorted(update_fields))
+        self.after_write('update', [i.pk for i in instances])
+        return True, self.bulk_results(errors, iter(instances))
+
+    def get_bulk_update_fields(self):
+        """
+        Return the names of the model fields that bulk_update() can write.
+        """
+        return self.get_metadata().bulk_update_fields
+
+    def bulk_delete(self, ids):
+        """
+        Handle a DELETE request with a JSON array body (of ids, or of objects
+        with an id) on the collection url, by deleting all of the instances
+        with a single filter(pk__in=...) query in one transaction.
+
+        The response lists { 'id': id, 'status': 200 or 404 } for each id. If
+        bulk_atomic is True and any id can't be deleted, nothing is deleted.
+        """
+        if not self.allow_bulk:
+            return False, { 'status': 501 }
+        ids = [str(i.get('id') if isinstance(i, dict) else i) for i in ids]
+        with transaction.atomic(using=self.get_write_db()):
+            try:
+                existing = dict((str(obj.pk), obj) for obj in self.get_queryset('delete').filter(pk__in=ids))
+            except (ValueError, TypeError):
+                return False, { 'status': 400 }
+            if self.get_metadata().checks_object_perms:
+                allowed = set(pk for pk, obj in existing.items() if self.user_has_perm(self.request, obj, 'delete'))
+            else:
+                allowed = set(existing)
+            results = [{ 'id': id, 'status': 200 if id in allowed else 404 } for id in ids]
+            if self.bulk_atomic and len(allowed) < len(set(ids)):
+                return False, { 'errors': results, 'status': 404 }
+            self.get_write_manager().filter(pk__in=[existing[pk].pk for pk in allowed]).delete()
+            self.audit('BULK_DELETE', 'SUCCESS', ids=sorted(allowed))
+            self.after_write('delete', [existing[pk].pk for pk in allowed])
+        return True, results
+
+    def audit(self, action, outcome, level=logging.INFO, **details):
+        """
+        Log a write to the audit logger as an AuditRecord, whose message is only
+        formatted if it's emitted (see djangbone.audit.start_audit_queue() to
+        do that on a background thread). Nothing is done if the level is disabled.
+        """
+        if not logger.isEnabledFor(level):
+            return
+        record = AuditRecord(self.base_queryset.model.__name__, action, outcome,
+                getattr(self.request.user, 'username', None), details.items())
+        logger.log(level, '%s', record, extra={ 'audit': record })
+
+    def after_write(self, action, ids):
+        """
+        Called after instances have been successfully created, updated or deleted
+        (action is 'create', 'update' or 'delete'), with a list of their ids.
+        """
+        if self.read_your_writes:
+            self.last_write = time.time()
+        self.invalidate_cache()
+        write_db = self.get_write_db()
+        if transaction.get_connection(write_db).in_atomic_block:
+            # Readers could re-cache the old data before the transaction commits:
+            transaction.on_commit(self.invalidate_cache, using=write_db)
+        if action == 'delete' and self.delta_sync:
+            label = self.get_metadata().label
+            tombstone_model = self.get_tombstone_model()
+            tombstone_model.objects.db_manager(write_db).bulk_create(
+                    [tombstone_model(model_label=label, object_id=str(id)) for id in ids])
+        if self.event_broker is not None:
+            # Clients refetch when notified, so the event can't go out before the commit:
+            event = self.get_change_event(action, ids)
+            transaction.on_commit(lambda: self.event_broker.publish(self.get_event_channel(), event),
+                    using=write_db)
+
+    def get_event_channel(self):
+        """
+        Return the event_broker channel that this view's change events are
+        published to (by default, one per model).
+        """
+        return 'djangbone:%s' % self.get_metadata().label
+
+    def get_change_event(self, action, ids):
+        """
+        Return the event published for a write: a dict with the action
+        ('create', 'update' or 'delete') and the affected ids. EventStreamView
+        removes the ids that each client may not read (see its filter_event(),
+        which needs overriding too if the event's shape changes).
+        """
+        return { 'action': action, 'ids': ids }
+
+    def get_cache(self):
+        return caches[self.cache_alias or 'default']
+
+    def get_cache_version(self):
+        """
+        Return the current version number of this view's model, which is part of
+        every cache key so that bumping it invalidates all cached responses.
+        """
+        cache, key = self.get_cache(), 'djangbone:version:%s' % self.get_metadata().label
+        version = cache.get(key)
+        if version is None:
+            # Start from the current time rather than 1, so that an evicted
+            # counter never reuses the version of still-cached responses:
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+        return version
+
+    def invalidate_cache(self):
+        """
+        Bump the model's cache version, so that no response cached before a
+        write will be served again.
+        """
+        if not (self.cache_alias or self.total_count == 'cached'):
+            return
+        cache, key = self.get_cache(), 'djangbone:version:%s' % self.get_metadata().label
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+    def get_cache_key(self, id=None):
+        """
+        Build the cache key for a GET: the view class, model version, id, and a
+        hash of the query string (for pages, cursors etc.) and Accept header.
+        """
+        variant = '%s:%s' % (self.request.META.get('QUERY_STRING', ''), self.request.META.get('HTTP_ACCEPT', ''))
+        if self.caches_per_user():
+            variant += ':%s' % getattr(self.request.user, 'pk', None)
+        return 'djangbone:%s.%s:%s:%s:%s' % (self.__module__, self.__class__.__name__, self.get_cache_version(),
+                id or '', hashlib.md5(variant.encode('utf-8')).hexdigest())
+
+    def caches_per_user(self):
+        """
+        Return whether cached responses are kept separately for each user. A
+        cache hit skips the permission hooks, so unless cache_per_user says
+        otherwise, this is the case whenever they're overridden.
+        """
+        if self.cache_per_user is None:
+            metadata = self.get_metadata()
+            return (metadata.checks_object_perms or metadata.checks_collection_perms or
+                    metadata.filters_for_user)
+        return self.cache_per_user
+
+    _cache_stats = None
+
+    @classmethod
+    def get_cache_stats(cls):
+        """
+        Return this view class's response cache { 'hits': n, 'misses': n } counters
+        (per process, and not synchronized between threads, so approximate).
+        """
+        stats = cls.__dict__.get('_cache_stats')
+        if stats is None:
+            stats = cls._cache_stats = { 'hits': 0, 'misses': 0 }
+        return stats
+
+    def _get(self, request, *args, **kwargs):
+        """
+        Serve GETs from the response cache when cache_alias is set, falling back
+        to BackboneAPIView._get() and caching its successful responses.
+        """
+        if not self.cache_alias:
+            return super(ModelAPIView, self)._get(request, *args, **kwargs)
+        key = self.get_cache_key(kwargs.get('id', None))
+        response = self.get_cached_response(request, key)
+        if response is None:
+            response = super(ModelAPIView, self)._get(request, *args, **kwargs)
+            self.cache_response(key, response)
+        return response
+
+    def get_cached_response(self, request, key):
+        """
+        Return the cached response for the key, or None on a cache miss.
+        """
+        cached = self.get_cache().get(key)
+        if cached is None:
+            self.get_cache_stats()['misses'] += 1
+            return None
+        self.get_cache_stats()['hits'] += 1
+        content, headers = cached
+        response = HttpResponse(content)
+        for header, value in headers:
+            response[header] = value
+        if self.conditional_get:
+            response = get_conditional_response(request, etag=response.get('ETag'), response=response)
+        return response
+
+    def cache_response(self, key, response):
+        if response.status_code == 200 and not response.streaming:
+            self.get_cache().set(key, (response.content, list(response.items())), self.cache_timeout)
+
+    def bulk_results(self, errors, instances):
+        """
+        Build the per-item response for a bulk create or update: the serialized
+        instance for each valid item, and its error for the others.
+        """
+        return [self.serialize_instance(next(instances)) if error is None else error for error in errors]
 
 class CustomModelAPIView(ModelAPIView):
+    """
+    ModelAPIView variant that serializes model instances (see serialize_item())
+    rather than using .values(), so subclasses can customize each item's output.
+    """
+    # Whether to restrict querysets to serialize_fields with only() and prefetch_related().
+    # None (the default) means only when serialize_item() isn't overridden, since an
+    # override may read other fields or relations:
+    optimize_serialize_queryset = None
+
+    def get_serialization_plan(self):
+        """
+        Return the SerializationPlan for this view's model and serialize_fields,
+        which is kept with the rest of its ViewMetadata (see get_metadata()).
+        """
+        return self.get_metadata().serialization_plan
+
+    def optimizes_serialize_queryset(self):
+        if self.optimize_serialize_queryset is None:
+            return type(self).serialize_item is CustomModelAPIView.serialize_item
+        return self.optimize_serialize_queryset
 
     def serialize_item(self, item):
-        item_dict = model_to_dict(item)
-        if self.serialize_fields:
-            for k in item_dict.keys():
-                if k not in self.serialize_fields: del item_dict[k]
+        item_dict = self.get_serialization_plan().serialize(item)
         item_dict['id'] = item.pk
         return item_dict
 
+    def serialize_instance(self, instance):
+        if self.get_metadata().custom_serialize_qs:
+            return self.reserialize_instance(instance)
+        return self.serialize_item(instance)
+
+    def serialize_written(self, instance, changed=None):
+        """
+        Like ModelAPIView.serialize_written(), but filtering serialize_item()'s
+        output for 'changed' responses. Keys that aren't model fields (ie.
+        computed by serialize_item()) are kept.
+        """
+        if self.get_write_response() != 'changed' or changed is None:
+            return super(CustomModelAPIView, self).serialize_written(instance, changed)
+        metadata = self.get_metadata()
+        names = metadata.field_names - set(changed) - set([metadata.pk_name])
+        return dict((key, value) for key, value in self.serialize_instance(instance).items()
+                if key == 'id' or key not in names)
+
     def serialize_qs(self, queryset, single_object=False):
+        if self.optimizes_serialize_queryset():
+            extra_fields = self.get_cursor_field_names() if self.uses_cursor_pagination() else ()
+            queryset = self.get_serialization_plan().prepare_queryset(queryset, extra_fields)
         if single_object or self.kwargs.get('id'):
             # For single-item requests, convert ValuesQueryset to a dict simply
             # by slicing the first item:
             return self.serialize_item(queryset[0])
         else:
-            paginated_queryset = queryset
-            # Process pagination options if they are enabled:
-            if isinstance(self.page_size, int):
-                try:
-                    page_number = int(self.request.GET.get(self.page_param_name, 1))
-                    offset = (page_number - 1) * self.page_size
-                except ValueError:
-                    offset = 0
-                paginated_queryset = queryset[offset:offset+self.page_size]
+            self.add_total_count(queryset)
+            paginated_queryset = self.paginate_qs(queryset)
+            if self.stream_collections:
+                return StreamedCollection(self.serialize_item(i) for i in self.iterate_rows(paginated_queryset))
             values = [ self.serialize_item(i) for i in paginated_queryset ]
             return values
 
@@ -9,7 +9,9 @@ setup( name='djangbone',
     author_email = 'aaron.franks+djangbone@gmail.com',
 
     keywords = ['django', 'backbone.js',],
-    packages = ['djangbone',],
+    packages = ['djangbone', 'djangbone.benchmarks', 'djangbone.tombstones', 'djangbone.tombstones.migrations',],
+    python_requires = '>=3.8',
+    install_requires = ['Django>=4.2',],
     classifiers = [
         'Environment :: Web Environment',
         'Framework :: Django',
@@ -17,5 +19,6 @@ setup( name='djangbone',
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
     ],
 )